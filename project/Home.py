@@ -1,10 +1,10 @@
 import logging
 import streamlit as st
 from project.enums import TransactionColumn
-from project.settings import TRANSACTIONS_FILES_DIR
+from project.settings import SQL_BACKEND_ENABLED, TRANSACTIONS_FILES_DIR
 from project.transactions_aggregation import get_file_path_aggregated_df
 from project.utils import get_emoji
-from project.app_data import read_fresh_data
+from project.app_data import read_fresh_data, read_sql_store
 
 st.set_page_config(
     layout="wide", page_icon=get_emoji("favicon"), page_title="MI | Transactions"
@@ -31,8 +31,6 @@ st.write(
 # Optional: Add a placeholder for future updates
 st.info("More features are coming soon! Stay tuned.")
 
-_, transactions_df = read_fresh_data()
-
 
 st.subheader("List of input files")
 st.write(
@@ -42,7 +40,11 @@ st.write(
 )
 
 
-file_paths_df = get_file_path_aggregated_df(transactions_df)
+if SQL_BACKEND_ENABLED:
+    file_paths_df = read_sql_store().get_file_path_aggregated_df()
+else:
+    _, dataset = read_fresh_data()
+    file_paths_df = get_file_path_aggregated_df(dataset.df)
 
 st.dataframe(
     file_paths_df,
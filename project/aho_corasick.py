@@ -0,0 +1,68 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton finding all occurrences of many patterns in a text
+    in a single pass over the text.
+
+    Every pattern carries an integer value (e.g. rule position), matches are
+    reported as these values.
+    """
+
+    def __init__(self, patterns: list[tuple[str, int]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._outputs: list[list[int]] = [[]]
+
+        for pattern, value in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._outputs[state].append(value)
+
+        # breadth first, so fail states are complete before their children
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail_state = self._fail[state]
+                while fail_state and char not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                self._fail[next_state] = self._goto[fail_state].get(char, 0)
+                self._outputs[next_state] = (
+                    self._outputs[next_state] + self._outputs[self._fail[next_state]]
+                )
+                queue.append(next_state)
+
+        self._min_output = [min(values, default=None) for values in self._outputs]
+
+    def _iter_states(self, text: str):
+        state = 0
+        yield state
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            yield state
+
+    def find_all(self, text: str) -> set[int]:
+        """Values of all patterns occurring in `text`."""
+        found = set()
+        for state in self._iter_states(text):
+            found.update(self._outputs[state])
+        return found
+
+    def find_min(self, text: str) -> int | None:
+        """Lowest value of the patterns occurring in `text`."""
+        found = None
+        for state in self._iter_states(text):
+            value = self._min_output[state]
+            if value is not None and (found is None or value < found):
+                found = value
+        return found
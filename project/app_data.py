@@ -1,58 +1,164 @@
 import logging
+import threading
+from datetime import datetime
 
 import streamlit as st
-import pandas as pd
 from project.categories import (
     CategoriesCache,
     CategoriesRules,
     read_categories_rules,
 )
+from project.dataset import Dataset, DatasetStore, get_dataset_version
+from project.partitions import PartitionedStore
+from project.snapshot import read_snapshot, write_snapshot
+from project.sql_backend import SqlTransactionsStore
+from project.ingestion import (
+    IngestionManifest,
+    iter_csv_files_chunks,
+    read_csv_files_incrementally,
+)
 from project.transactions_read import (
+    CsvFile,
     add_columns,
+    add_columns_in_chunks,
     discover_csv_files,
-    parse_csv_files_as_df,
 )
 from project.settings import (
     CATEGORIES_CACHE_FILE_PATH,
     CATEGORIES_RULES_FILE_PATH,
+    DATASET_SNAPSHOT_FILE_PATH,
+    INGESTION_CHUNK_SIZE,
+    INGESTION_MANIFEST_FILE_PATH,
+    PARSED_FILES_CACHE_DIR,
+    PARTITIONED_DATASET_DIR,
+    SQL_STORE_FILE_PATH,
     TRANSACTIONS_FILES_DIR,
 )
 
 
 log = logging.getLogger(__name__)
+_sql_store_lock = threading.Lock()
+_partitions_lock = threading.Lock()
 
 
-@st.cache_data
-def _add_columns_to_raw_transactions(
-    transactions_raw_df: pd.DataFrame,
-    categories_rules: CategoriesRules,
-    categories_cache: CategoriesCache,
-):
-    log.info("adding columns")
-    return add_columns(transactions_raw_df, categories_rules, categories_cache)
+@st.cache_resource
+def get_dataset_store(transactions_files_dir: str) -> DatasetStore:
+    # one store per data directory, shared by all sessions
+    return DatasetStore()
 
 
-def _read_all_transactions_raw() -> pd.DataFrame:
-    log.info("Reading raw transactions from source files")
-    csv_files = discover_csv_files(TRANSACTIONS_FILES_DIR)
-    df = parse_csv_files_as_df(csv_files)
-    log.info(f"Read {len(df)} raw transactions from source files")
-    return df
+def _get_categories(categories_rules: CategoriesRules) -> list[str]:
+    return sorted(set(cr.category for cr in categories_rules.items))
+
 
+def _read_dataset(
+    version: str,
+    csv_files: list[CsvFile],
+    manifest: IngestionManifest,
+    categories_rules: CategoriesRules,
+) -> Dataset:
+    dataset = read_snapshot(DATASET_SNAPSHOT_FILE_PATH, version)
+    if dataset is not None:
+        return dataset
 
-def read_fresh_data():
+    log.info(f"Reading dataset {version}")
     categories_cache = CategoriesCache(file_path=CATEGORIES_CACHE_FILE_PATH)
     categories_cache.read()
 
+    transactions_raw_df = read_csv_files_incrementally(csv_files, manifest)
+    log.info(f"Read {len(transactions_raw_df)} raw transactions from source files")
+
+    log.info("adding columns")
+    transactions_df = add_columns(
+        transactions_raw_df, categories_rules, categories_cache
+    )
+    categories = _get_categories(categories_rules)
+    dataset = Dataset(df=transactions_df, version=version, categories=tuple(categories))
+    write_snapshot(dataset, DATASET_SNAPSHOT_FILE_PATH)
+    return dataset
+
+
+def _read_inputs() -> tuple[str, list[CsvFile], IngestionManifest, CategoriesRules]:
     categories_rules = read_categories_rules(
         CATEGORIES_RULES_FILE_PATH, add_fallback=True
     )
-    all_categories = sorted(list(set([cr.category for cr in categories_rules.items])))
+    csv_files = discover_csv_files(TRANSACTIONS_FILES_DIR)
+    manifest = IngestionManifest(
+        file_path=INGESTION_MANIFEST_FILE_PATH, cache_dir=PARSED_FILES_CACHE_DIR
+    )
+    manifest.read()
+    version = get_dataset_version(
+        manifest.fingerprint(csv_files), categories_rules.csv_md5
+    )
+    if manifest.is_modified:
+        manifest.write()
+    return version, csv_files, manifest, categories_rules
 
-    all_transactions_raw_df = _read_all_transactions_raw()
 
-    all_transactions_df = _add_columns_to_raw_transactions(
-        all_transactions_raw_df, categories_rules, categories_cache
+def _get_dataset(
+    version: str,
+    csv_files: list[CsvFile],
+    manifest: IngestionManifest,
+    categories_rules: CategoriesRules,
+) -> Dataset:
+    # built once per version, under the lock of the store shared by all sessions
+    return get_dataset_store(TRANSACTIONS_FILES_DIR).get(
+        version,
+        lambda: _read_dataset(version, csv_files, manifest, categories_rules),
     )
 
-    return all_categories, all_transactions_df
+
+def read_dataset() -> Dataset:
+    return _get_dataset(*_read_inputs())
+
+
+def read_dataset_range(start_datetime: datetime, end_datetime: datetime) -> Dataset:
+    """
+    Transactions within the dates, read from the monthly partitions
+    intersecting them, rewritten when the input files or categories rules
+    changed. `read_dataset` is the full history.
+    """
+    version, csv_files, manifest, categories_rules = _read_inputs()
+    store = PartitionedStore(root_dir=PARTITIONED_DATASET_DIR)
+    if store.version != version:
+        with _partitions_lock:
+            # another session could have rewritten them while we were waiting
+            if store.version != version:
+                store.write(
+                    _get_dataset(version, csv_files, manifest, categories_rules)
+                )
+    return store.read(start_datetime, end_datetime)
+
+
+def read_sql_store() -> SqlTransactionsStore:
+    """
+    Transactions store of the sql backend, rebuilt when the input files or
+    categories rules changed. Transactions are ingested in chunks, so that
+    the whole dataset is never loaded to memory.
+    """
+    version, csv_files, manifest, categories_rules = _read_inputs()
+    store = SqlTransactionsStore(file_path=SQL_STORE_FILE_PATH)
+    if store.version != version:
+        with _sql_store_lock:
+            # another session could have rebuilt it while we were waiting
+            if store.version != version:
+                log.info(f"Ingesting dataset {version} in chunks")
+                categories_cache = CategoriesCache(file_path=CATEGORIES_CACHE_FILE_PATH)
+                categories_cache.read()
+                store.write_chunks(
+                    add_columns_in_chunks(
+                        iter_csv_files_chunks(
+                            csv_files, manifest, chunk_size=INGESTION_CHUNK_SIZE
+                        ),
+                        categories_rules,
+                        categories_cache,
+                    ),
+                    version,
+                    _get_categories(categories_rules),
+                )
+    return store
+
+
+def read_fresh_data() -> tuple[list[str], Dataset]:
+    dataset = read_dataset()
+    return list(dataset.categories), dataset
@@ -0,0 +1,209 @@
+import dataclasses
+import functools
+import inspect
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import pandas as pd
+
+from project.constants import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    max_entries: int = CACHE_MAX_ENTRIES
+    max_bytes: int | None = CACHE_MAX_BYTES
+    ttl_seconds: float | None = CACHE_TTL_SECONDS
+
+
+DEFAULT_CACHE_POLICY = CachePolicy()
+
+
+@dataclass
+class CacheStats:
+    name: str
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    n_entries: int = 0
+    n_bytes: int = 0
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    n_bytes: int
+    created_at: float
+
+
+def estimate_n_bytes(value: Any) -> int:
+    """Approximate memory taken by a cached value."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(
+            estimate_n_bytes(getattr(value, f.name)) for f in dataclasses.fields(value)
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_n_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_n_bytes(k) + estimate_n_bytes(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+def _make_key(value: Any, hash_funcs: dict[type, Callable[[Any], Any]]) -> Any:
+    for value_type, hash_func in hash_funcs.items():
+        if isinstance(value, value_type):
+            return (value_type.__name__, hash_func(value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_make_key(v, hash_funcs) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_make_key(v, hash_funcs) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _make_key(v, hash_funcs)) for k, v in value.items()))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return (type(value).__name__,) + tuple(
+            _make_key(getattr(value, f.name), hash_funcs)
+            for f in dataclasses.fields(value)
+        )
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        raise TypeError(
+            "Memoized functions don't hash dataframes, pass a Dataset instead"
+        )
+    return value
+
+
+class MemoizedFunction:
+    """
+    Function whose results are kept in a process-wide LRU cache, bounded by
+    the number of entries, their estimated size and their age.
+
+    Cached values are shared between callers and must not be modified.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        policy: CachePolicy,
+        hash_funcs: dict[type, Callable[[Any], Any]],
+    ) -> None:
+        self.func = func
+        self.policy = policy
+        self.hash_funcs = hash_funcs
+        self.signature = inspect.signature(func)
+        self.stats = CacheStats(name=f"{func.__module__}.{func.__qualname__}")
+        self._entries: OrderedDict[Any, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, func)
+
+    def _key(self, args: tuple, kwargs: dict) -> Any:
+        arguments = self.signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        return _make_key(dict(arguments.arguments), self.hash_funcs)
+
+    def _remove(self, key: Any, is_eviction: bool = True) -> None:
+        entry = self._entries.pop(key)
+        self.stats.evictions += int(is_eviction)
+        self.stats.n_entries -= 1
+        self.stats.n_bytes -= entry.n_bytes
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        ttl_seconds = self.policy.ttl_seconds
+        return ttl_seconds is not None and now - entry.created_at > ttl_seconds
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args, kwargs)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry, time.monotonic()):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry.value
+            self.stats.misses += 1
+
+        # computed outside of the lock, concurrent misses may compute twice
+        value = self.func(*args, **kwargs)
+        entry = _CacheEntry(
+            value=value, n_bytes=estimate_n_bytes(value), created_at=time.monotonic()
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, is_eviction=False)
+            self._entries[key] = entry
+            self.stats.n_entries += 1
+            self.stats.n_bytes += entry.n_bytes
+            self._evict()
+        return value
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if self._is_expired(e, now)]:
+            self._remove(key)
+        max_bytes = self.policy.max_bytes
+        while len(self._entries) > self.policy.max_entries or (
+            max_bytes is not None
+            and self.stats.n_bytes > max_bytes
+            and len(self._entries) > 1  # the newest entry is kept anyway
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stats.n_entries = 0
+            self.stats.n_bytes = 0
+
+
+_MEMOIZED_FUNCTIONS: list[MemoizedFunction] = []
+
+
+def memoize(
+    policy: CachePolicy = DEFAULT_CACHE_POLICY,
+    hash_funcs: dict[type, Callable[[Any], Any]] | None = None,
+) -> Callable[[Callable], MemoizedFunction]:
+    """
+    Caches the results of the decorated function according to `policy`.
+    `hash_funcs` maps argument types to the value they are keyed on, as in
+    `st.cache_data`.
+
+    Unlike `st.cache_data`, results are not copied: every call returns the
+    same object, so callers must not mutate it (e.g. assign dataframe
+    columns), but derive new objects from it.
+    """
+
+    def decorator(func: Callable) -> MemoizedFunction:
+        memoized_function = MemoizedFunction(func, policy, hash_funcs or {})
+        _MEMOIZED_FUNCTIONS.append(memoized_function)
+        return memoized_function
+
+    return decorator
+
+
+def get_caches_stats() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            dataclasses.asdict(f.stats) | dataclasses.asdict(f.policy)
+            for f in _MEMOIZED_FUNCTIONS
+        ]
+    )
+
+
+def clear_caches() -> None:
+    for memoized_function in _MEMOIZED_FUNCTIONS:
+        memoized_function.clear()
+    log.info(f"Cleared {len(_MEMOIZED_FUNCTIONS)} caches")
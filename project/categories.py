@@ -1,11 +1,14 @@
+from contextlib import closing
 import csv
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+import sqlite3
+from typing import Iterable
 
 import pandas as pd
 import logging
 from project.constants import UNRECOGNIZED
-from project.utils import calculate_md5
+from project.utils import calculate_md5, hash_string
 from project.enums import CategoryRuleColumn, TransactionColumn
 
 log = logging.getLogger(__name__)
@@ -31,7 +34,8 @@ class Condition:
             return self.value in other_value
 
         def is_lower_than() -> bool:
-            return self.value >= other_value
+            # rules values are read from csv as strings
+            return float(self.value) >= float(other_value)
 
         return {
             "equals": equals,
@@ -46,11 +50,43 @@ class CategoryRule:
     category: str
     conditions: list[Condition]
 
+    @property
+    def fingerprint(self) -> str:
+        return hash_string(
+            repr(
+                [self.category]
+                + [(c.column, c.relation.name, c.value) for c in self.conditions]
+            )
+        )
+
+
+def index_equals_conditions(
+    items: list[CategoryRule],
+) -> dict[str, dict[str, list[int]]]:
+    """
+    Positions of rules in `items` by column and value of their first `equals`
+    condition, e.g. {"contractor": {"Kroger": [2, 15]}}.
+    """
+    equals_index = {}
+    for i_rule, rule in enumerate(items):
+        for condition in rule.conditions:
+            if condition.relation == Relation.equals and isinstance(
+                condition.value, str
+            ):
+                equals_index.setdefault(condition.column, {}).setdefault(
+                    condition.value, []
+                ).append(i_rule)
+                break
+    return equals_index
+
 
 @dataclass
 class CategoriesRules:
     items: list[CategoryRule]
     csv_md5: str
+    equals_index: dict[str, dict[str, list[int]]] = field(
+        default_factory=dict, repr=False
+    )
 
     @property
     def df(self) -> pd.DataFrame:
@@ -72,6 +108,27 @@ class CategoriesRules:
     def max_rule_id(self) -> int:
         return int(max([item.rule_id for item in self.items]))
 
+    @property
+    def fingerprints(self) -> dict[int, str]:
+        return {
+            rule.rule_id: rule.fingerprint
+            for rule in self.items
+            if rule.rule_id is not None
+        }
+
+    def starting_from(self, rule_id: float) -> "CategoriesRules":
+        """Rules with id of at least `rule_id`, and the fallback rule."""
+        items = [
+            rule
+            for rule in self.items
+            if rule.rule_id is None or rule.rule_id >= rule_id
+        ]
+        return CategoriesRules(
+            items=items,
+            csv_md5=self.csv_md5,
+            equals_index=index_equals_conditions(items),
+        )
+
 
 def read_categories_rules(
     categories_rules_csv_path: str, add_fallback: bool = True
@@ -122,6 +179,7 @@ def read_categories_rules(
                 conditions=[Condition("title", Relation.contains, "")],
             )
         )
+    categories_rules.equals_index = index_equals_conditions(items)
     log.info(f"Read {len(items)} categories rules from {categories_rules_csv_path}")
 
     return categories_rules
@@ -161,8 +219,15 @@ def save_categories_rules_as_csv(
     )
 
 
-class CategoriesCache(dict):
-    _mandatory_csv_cols = [
+class CategoriesCache:
+    """
+    Categories assigned to transactions, stored in a sqlite database keyed by
+    transaction id, along with the rules they were assigned with. Categories
+    are queried for the given transactions only, so that memory taken doesn't
+    depend on the size of the cache.
+    """
+
+    _cols = [
         TransactionColumn.TRANSACTION_ID,
         TransactionColumn.CATEGORY,
         TransactionColumn.CATEGORY_RULE_ID,
@@ -170,30 +235,186 @@ class CategoriesCache(dict):
 
     def __init__(self, *, file_path) -> None:
         self.file_path = file_path
-        super().__init__()
+        # md5 of the rules csv and fingerprints of the rules the cached
+        # categories were assigned with
+        self.rules_csv_md5: str | None = None
+        self.rules_fingerprints: dict[int, str] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.file_path)
+        connection.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS categories (
+                {TransactionColumn.TRANSACTION_ID} TEXT PRIMARY KEY,
+                {TransactionColumn.CATEGORY} TEXT,
+                {TransactionColumn.CATEGORY_RULE_ID} INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS rules (
+                {CategoryRuleColumn.RULE_ID} INTEGER PRIMARY KEY,
+                fingerprint TEXT
+            );
+            CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS kept_ids (
+                {TransactionColumn.TRANSACTION_ID} TEXT PRIMARY KEY
+            );
+            """
+        )
+        return connection
+
+    @staticmethod
+    def _insert_ids(
+        connection: sqlite3.Connection, table: str, transaction_ids: Iterable[str]
+    ) -> None:
+        connection.executemany(
+            f"INSERT OR IGNORE INTO {table} VALUES (?)",
+            ((transaction_id,) for transaction_id in transaction_ids),
+        )
 
     def read(self) -> None:
+        """Reads the rules the cached categories were assigned with."""
+        log.info(f"Trying to read categories cache from {self.file_path}")
         try:
-            log.info(f"Trying to read categories cache from {self.file_path}")
-            df = pd.read_csv(self.file_path, usecols=self._mandatory_csv_cols)
-        except:
-            log.info(f"Couldn't read categories cache from {self.file_path}")
+            with closing(self._connect()) as connection:
+                rules = connection.execute(
+                    f"SELECT {CategoryRuleColumn.RULE_ID}, fingerprint FROM rules"
+                ).fetchall()
+                metadata = dict(
+                    connection.execute("SELECT key, value FROM metadata").fetchall()
+                )
+        except sqlite3.Error as e:
+            log.info(f"Couldn't read categories cache from {self.file_path}: {e}")
             return
-        for r in df.itertuples():
-            self[r.__getattribute__(TransactionColumn.TRANSACTION_ID)] = (
-                r.__getattribute__(TransactionColumn.CATEGORY),
-                r.__getattribute__(TransactionColumn.CATEGORY_RULE_ID),
+
+        self.rules_fingerprints = dict(rules)
+        self.rules_csv_md5 = metadata.get("rules_csv_md5")
+        log.info(f"Read rules of categories cache {self.file_path}")
+
+    def get_categories(self, transaction_ids: pd.Series) -> pd.DataFrame:
+        """
+        Cached category and category rule id of each transaction, indexed as
+        `transaction_ids`, both are NaN for transactions missing from cache.
+        """
+        str_ids = transaction_ids.astype(str)
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "CREATE TEMP TABLE lookup_ids "
+                f"({TransactionColumn.TRANSACTION_ID} TEXT PRIMARY KEY)"
+            )
+            self._insert_ids(connection, "lookup_ids", str_ids)
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(self._cols)} FROM categories "
+                f"JOIN lookup_ids USING ({TransactionColumn.TRANSACTION_ID})",
+                connection,
             )
-        logging.info(f"Read categories for {len(df)} transactions")
+        df[TransactionColumn.CATEGORY_RULE_ID] = df[
+            TransactionColumn.CATEGORY_RULE_ID
+        ].astype(float)
+        df = df.set_index(TransactionColumn.TRANSACTION_ID).reindex(str_ids)
+        df.index = transaction_ids.index
+        return df
+
+    def write(
+        self,
+        transactions_df: pd.DataFrame,
+        categories_rules: CategoriesRules,
+        save_rules: bool = True,
+    ) -> None:
+        """
+        Saves categories of new transactions and ones that changed. Without
+        `save_rules` the cache keeps the rules it was written with before,
+        see `write_rules`.
+        """
+        df = (
+            transactions_df[self._cols]
+            .astype({TransactionColumn.TRANSACTION_ID: str})
+            .drop_duplicates(TransactionColumn.TRANSACTION_ID, keep="last")
+        )
+        category, rule_id = (
+            TransactionColumn.CATEGORY,
+            TransactionColumn.CATEGORY_RULE_ID,
+        )
 
-    def write(self, transactions_df: pd.DataFrame) -> None:
-        df = transactions_df[self._mandatory_csv_cols].copy()
-        df.to_csv(self.file_path, index=False)
+        # single transaction, so the cache is never written partially
+        with closing(self._connect()) as connection, connection:
+            n_changes_before = connection.total_changes
+            # rows with the same category and rule id are left untouched
+            connection.executemany(
+                f"INSERT INTO categories ({', '.join(self._cols)}) VALUES (?, ?, ?) "
+                f"ON CONFLICT ({TransactionColumn.TRANSACTION_ID}) DO UPDATE SET "
+                f"{category} = excluded.{category}, {rule_id} = excluded.{rule_id} "
+                f"WHERE {category} IS NOT excluded.{category} "
+                f"OR {rule_id} IS NOT excluded.{rule_id}",
+                zip(
+                    df[TransactionColumn.TRANSACTION_ID],
+                    df[category],
+                    [None if pd.isna(r) else int(r) for r in df[rule_id]],
+                ),
+            )
+            n_changed = connection.total_changes - n_changes_before
+            if save_rules:
+                self._save_rules(connection, categories_rules)
+
+        log.info(f"Saved categories of {n_changed} transactions")
+
+    def _save_rules(
+        self, connection: sqlite3.Connection, categories_rules: CategoriesRules
+    ) -> None:
+        rules_fingerprints = categories_rules.fingerprints
+        connection.execute("DELETE FROM rules")
+        connection.executemany(
+            "INSERT INTO rules VALUES (?, ?)", rules_fingerprints.items()
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('rules_csv_md5', ?)",
+            (categories_rules.csv_md5,),
+        )
+        self.rules_fingerprints = rules_fingerprints
+        self.rules_csv_md5 = categories_rules.csv_md5
+
+    def keep(self, transaction_ids: Iterable) -> None:
+        """Marks transactions whose categories the next `prune` keeps."""
+        with closing(self._connect()) as connection, connection:
+            self._insert_ids(connection, "kept_ids", (str(i) for i in transaction_ids))
+
+    def prune(self) -> None:
+        """
+        Drops categories of transactions not marked with `keep` since the last
+        prune (e.g. from removed input files), so that the cache doesn't grow
+        forever.
+        """
+        with closing(self._connect()) as connection, connection:
+            n_pruned = connection.execute(
+                f"DELETE FROM categories WHERE {TransactionColumn.TRANSACTION_ID} "
+                f"NOT IN (SELECT {TransactionColumn.TRANSACTION_ID} FROM kept_ids)"
+            ).rowcount
+            connection.execute("DELETE FROM kept_ids")
+        log.info(f"Pruned categories of {n_pruned} transactions")
+
+    def write_rules(self, categories_rules: CategoriesRules) -> None:
+        """Marks the cached categories as assigned with `categories_rules`."""
+        with closing(self._connect()) as connection, connection:
+            self._save_rules(connection, categories_rules)
+
+    def first_changed_rule_id(self, categories_rules: CategoriesRules) -> float:
+        """
+        Lowest id of a rule added, removed or modified since the cache was
+        written. Cached categories assigned by rules with lower ids are still
+        valid, `inf` if no rule changed.
+        """
+        if self.rules_csv_md5 == categories_rules.csv_md5:
+            return float("inf")
+        fingerprints = categories_rules.fingerprints
+        changed_rules_ids = {
+            rule_id
+            for rule_id in fingerprints.keys() | self.rules_fingerprints.keys()
+            if fingerprints.get(rule_id) != self.rules_fingerprints.get(rule_id)
+        }
+        return float(min(changed_rules_ids, default=float("inf")))
 
     @property
     def is_empty(self):
-        return bool(len(self) == 0)
-
-    def __hash__(self):
-        # remove?
-        return self.rules_csv_md5
+        with closing(self._connect()) as connection:
+            return (
+                connection.execute("SELECT 1 FROM categories LIMIT 1").fetchone()
+                is None
+            )
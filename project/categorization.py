@@ -0,0 +1,231 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from project.aho_corasick import AhoCorasick
+from project.categories import (
+    CategoriesRules,
+    Condition,
+    Relation,
+    index_equals_conditions,
+)
+from project.constants import UNRECOGNIZED
+from project.enums import TransactionColumn
+
+log = logging.getLogger(__name__)
+
+NO_MATCH = -1
+
+
+class _Column:
+    """Values of a single transactions column, factorized once per evaluation."""
+
+    def __init__(self, values: pd.Series | None, n_rows: int) -> None:
+        if values is None:
+            # missing column never matches
+            values = pd.Series(np.nan, index=range(n_rows), dtype=object)
+        self.codes, self.uniques = pd.factorize(
+            values.to_numpy(dtype=object), use_na_sentinel=False
+        )
+        self._str_uniques = None
+        self._str_unique_codes = None
+        self._sorted_rows = None
+        self._numeric = None
+
+    @property
+    def str_uniques(self) -> np.ndarray:
+        if self._str_uniques is None:
+            self._str_uniques = np.array([str(u) for u in self.uniques], dtype=object)
+        return self._str_uniques
+
+    @property
+    def str_unique_codes(self) -> dict[str, list[int]]:
+        if self._str_unique_codes is None:
+            self._str_unique_codes = {}
+            for code, str_unique in enumerate(self.str_uniques):
+                self._str_unique_codes.setdefault(str_unique, []).append(code)
+        return self._str_unique_codes
+
+    def rows_equal_to(self, value: str) -> np.ndarray:
+        """Rows whose value as string is `value`, found with a hash lookup."""
+        if self._sorted_rows is None:
+            self._sorted_rows = np.argsort(self.codes, kind="stable")
+            self._code_bounds = np.searchsorted(
+                self.codes[self._sorted_rows], np.arange(len(self.uniques) + 1)
+            )
+        return np.concatenate(
+            [
+                self._sorted_rows[self._code_bounds[c] : self._code_bounds[c + 1]]
+                for c in self.str_unique_codes.get(value, [])
+            ]
+            or [np.array([], dtype=int)]
+        )
+
+    @property
+    def numeric(self) -> np.ndarray:
+        if self._numeric is None:
+            uniques_numeric = pd.to_numeric(
+                pd.Series(self.uniques, dtype=object), errors="coerce"
+            ).to_numpy(dtype=float)
+            self._numeric = uniques_numeric[self.codes]
+        return self._numeric
+
+    def equals(self, value: str, rows: np.ndarray) -> np.ndarray:
+        matching_codes = np.flatnonzero(self.str_uniques == value)
+        return np.isin(self.codes[rows], matching_codes)
+
+    def contains(self, value: str, rows: np.ndarray) -> np.ndarray:
+        rows_codes = self.codes[rows]
+        codes = np.unique(rows_codes)
+        is_match = np.zeros(len(self.uniques), dtype=bool)
+        is_match[codes] = [
+            isinstance(u, str) and value in u for u in self.uniques[codes]
+        ]
+        return is_match[rows_codes]
+
+    def is_lower_than(self, value: str, rows: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return self.numeric[rows] <= float(value)
+
+
+class CategorizationEngine:
+    """
+    Categories rules compiled for evaluation over whole columns.
+
+    Rules made of a single condition are resolved for all rows at once: `equals`
+    with one hash lookup per unique column value, `contains` with one
+    Aho-Corasick automaton per column. The remaining rules are evaluated in
+    order, only on rows without a match from any earlier rule, so the first
+    matching rule wins (as in `get_category`). Rules with an `equals` condition
+    are evaluated only on rows found with the `equals_index`.
+    """
+
+    def __init__(self, categories_rules: CategoriesRules) -> None:
+        self.rules = categories_rules.items
+        # extra last item, so that indexing with NO_MATCH gives the fallback
+        self.categories = np.array(
+            [rule.category for rule in self.rules] + [UNRECOGNIZED], dtype=object
+        )
+        self.rule_ids = np.array(
+            [np.nan if r.rule_id is None else r.rule_id for r in self.rules] + [np.nan],
+            dtype=float,
+        )
+
+        equals_index = categories_rules.equals_index or index_equals_conditions(
+            self.rules
+        )
+        # rule position -> (column, value) of its indexed `equals` condition
+        self._equals_anchors = {
+            i_rule: (column, value)
+            for column, values_rules in equals_index.items()
+            for value, rules_indices in values_rules.items()
+            for i_rule in rules_indices
+        }
+        self._single_equals_lookups: dict[str, dict[str, int]] = {}
+        contains_patterns: dict[str, list[tuple[str, int]]] = {}
+        self._scanned_rules_indices = []
+        for i_rule, rule in enumerate(self.rules):
+            if len(rule.conditions) == 1 and i_rule in self._equals_anchors:
+                column, value = self._equals_anchors[i_rule]
+                # rules are visited in order, the first one wins
+                self._single_equals_lookups.setdefault(column, {}).setdefault(
+                    value, i_rule
+                )
+            elif (
+                len(rule.conditions) == 1
+                and rule.conditions[0].relation == Relation.contains
+                and isinstance(rule.conditions[0].value, str)
+            ):
+                condition = rule.conditions[0]
+                contains_patterns.setdefault(condition.column, []).append(
+                    (condition.value, i_rule)
+                )
+            else:
+                self._scanned_rules_indices.append(i_rule)
+        self._contains_matchers = {
+            column: AhoCorasick(patterns)
+            for column, patterns in contains_patterns.items()
+        }
+
+    @staticmethod
+    def _evaluate(
+        condition: Condition, column: _Column, rows: np.ndarray
+    ) -> np.ndarray:
+        return {
+            Relation.equals: column.equals,
+            Relation.contains: column.contains,
+            Relation.is_lower_than: column.is_lower_than,
+        }[condition.relation](condition.value, rows)
+
+    def match(self, df: pd.DataFrame) -> np.ndarray:
+        """Position of the first matching rule for each row, `NO_MATCH` if none."""
+        columns: dict[str, _Column] = {}
+
+        def get_column(name: str) -> _Column:
+            if name not in columns:
+                columns[name] = _Column(df.get(name), len(df))
+            return columns[name]
+
+        n_rules = len(self.rules)
+        rule_index = np.full(len(df), n_rules)
+
+        for column_name, lookup in self._single_equals_lookups.items():
+            column = get_column(column_name)
+            uniques_rule_index = np.array(
+                [lookup.get(u, n_rules) for u in column.str_uniques], dtype=int
+            )
+            rule_index = np.minimum(rule_index, uniques_rule_index[column.codes])
+
+        for column_name, matcher in self._contains_matchers.items():
+            column = get_column(column_name)
+            uniques_rule_index = np.array(
+                [
+                    matcher.find_min(u) if isinstance(u, str) else None
+                    for u in column.uniques
+                ],
+                dtype=float,
+            )
+            uniques_rule_index = np.nan_to_num(uniques_rule_index, nan=n_rules)
+            rule_index = np.minimum(
+                rule_index, uniques_rule_index.astype(int)[column.codes]
+            )
+
+        pending_rows = np.arange(len(df))
+        for i_rule in self._scanned_rules_indices:
+            conditions = self.rules[i_rule].conditions
+            if i_rule in self._equals_anchors:
+                column_name, value = self._equals_anchors[i_rule]
+                matching_rows = get_column(column_name).rows_equal_to(value)
+                matching_rows = matching_rows[rule_index[matching_rows] > i_rule]
+            else:
+                pending_rows = pending_rows[rule_index[pending_rows] > i_rule]
+                if len(pending_rows) == 0:
+                    break
+                matching_rows = pending_rows
+            for condition in conditions:
+                if len(matching_rows) == 0:
+                    break
+                column = get_column(condition.column)
+                matching_rows = matching_rows[
+                    self._evaluate(condition, column, matching_rows)
+                ]
+            rule_index[matching_rows] = i_rule
+
+        rule_index[rule_index == n_rules] = NO_MATCH
+        return rule_index
+
+    def categorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Category and category rule id of each row, indexed as `df`."""
+        rule_index = self.match(df)
+        log.info(
+            f"Categorized {len(df)} transactions, "
+            f"{np.sum(rule_index == NO_MATCH)} without matching rule"
+        )
+        return pd.DataFrame(
+            {
+                TransactionColumn.CATEGORY: self.categories[rule_index],
+                TransactionColumn.CATEGORY_RULE_ID: self.rule_ids[rule_index],
+            },
+            index=df.index,
+        )
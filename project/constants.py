@@ -9,6 +9,24 @@ CATEGORIES_RULES_FILE_PATH = os.path.join(
     ROOT_INPUT_FILES_DIR, "categories", "categories_conditions.csv"
 )
 CATEGORIES_CACHE_FILE_PATH = os.path.join(
-    ROOT_INPUT_FILES_DIR, "cache", "categories_cache.csv"
+    ROOT_INPUT_FILES_DIR, "cache", "categories_cache.sqlite"
 )
+INGESTION_MANIFEST_FILE_PATH = os.path.join(
+    ROOT_INPUT_FILES_DIR, "cache", "ingestion_manifest.csv"
+)
+PARSED_FILES_CACHE_DIR = os.path.join(ROOT_INPUT_FILES_DIR, "cache", "parsed")
+DATASET_SNAPSHOT_FILE_PATH = os.path.join(
+    ROOT_INPUT_FILES_DIR, "cache", "dataset_snapshot.arrow"
+)
+PARTITIONED_DATASET_DIR = os.path.join(ROOT_INPUT_FILES_DIR, "cache", "partitioned")
+SQL_STORE_FILE_PATH = os.path.join(ROOT_INPUT_FILES_DIR, "cache", "transactions.sqlite")
+# query the sqlite store instead of keeping the whole dataset in memory
+SQL_BACKEND_ENABLED: Final[bool] = os.environ.get("MONEY_INSIGHTS_SQL_BACKEND") == "1"
+# rows of the input files ingested at once by the sql backend
+INGESTION_CHUNK_SIZE: Final[int] = 100_000
+PARSING_MAX_WORKERS: Final[int] = os.cpu_count() or 1
 UNRECOGNIZED: Final[str] = "unrecognized"
+CACHE_MAX_ENTRIES: Final[int] = 64
+CACHE_MAX_BYTES: Final[int] = 512 * 1024**2
+CACHE_TTL_SECONDS: Final[float] = 24 * 60 * 60
+TREE_MAX_LEAVES: Final[int] = 50
@@ -0,0 +1,72 @@
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+from project.utils import hash_string
+
+log = logging.getLogger(__name__)
+
+
+def get_dataset_version(input_files_fingerprint: str, rules_csv_md5: str) -> str:
+    return hash_string(f"{input_files_fingerprint}:{rules_csv_md5}")
+
+
+@dataclass(frozen=True, eq=False)
+class Dataset:
+    """
+    Read-only handle of the enriched transactions.
+
+    `version` identifies the content (input files and categories rules it was
+    built from), so cached functions taking a dataset are keyed on it instead
+    of on the whole dataframe, see `DATASET_HASH_FUNCS`. The dataframe must not
+    be modified in place.
+    """
+
+    df: pd.DataFrame = field(repr=False)
+    version: str
+    categories: tuple[str, ...] = ()
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, categories: tuple[str, ...] = ()) -> "Dataset":
+        """Dataset versioned by the dataframe content, e.g. built in tests."""
+        content_hash = hashlib.sha256(
+            pd.util.hash_pandas_object(df).to_numpy().tobytes()
+            + repr(list(df.columns)).encode()
+        ).hexdigest()
+        return cls(df=df, version=content_hash, categories=tuple(categories))
+
+
+DATASET_HASH_FUNCS = {Dataset: lambda dataset: dataset.version}
+
+
+class DatasetStore:
+    """
+    Holds the current dataset of a data directory, shared by all sessions of
+    the process without copying.
+
+    A new version is loaded once, under a lock, and replaces the previous
+    dataset in a single assignment, so readers get either the old or the new
+    dataset, never a partially built one. The load runs on the thread of the
+    request asking for the new version: it and every other request for that
+    version wait until it's done. Only code already holding the previous
+    dataset keeps using it meanwhile.
+    """
+
+    def __init__(self) -> None:
+        self._dataset: Dataset | None = None
+        self._lock = threading.Lock()
+
+    def get(self, version: str, load: Callable[[], Dataset]) -> Dataset:
+        dataset = self._dataset
+        if dataset is not None and dataset.version == version:
+            return dataset
+        with self._lock:
+            # another session could have loaded it while we were waiting
+            if self._dataset is None or self._dataset.version != version:
+                log.info(f"Loading dataset {version} into the store")
+                self._dataset = load()
+            return self._dataset
@@ -11,6 +11,7 @@ class TransactionColumn(StrEnum):
     TRANSACTION_DATE_ISOSTR = 'transaction_date_isostr'
     TRANSACTION_DATE_ISOSTR_MONTH = 'transaction_date_isostr_month'
     TRANSACTION_DATE_ISOSTR_YEAR = 'transaction_date_isostr_year'
+    YEAR_MONTH = 'year_month'  # e.g. 202401
     DESCRIPTION = "description"
 
     CATEGORY = "category"
@@ -41,6 +42,15 @@ class CategoryRuleColumn(StrEnum):
     CATEGORY = 'category'
 
 
+class MetricColumn(StrEnum):
+    INCOME = 'income'
+    EXPENSE = 'expense'
+    SAVINGS = 'savings'
+    N_EXPENSE_TRANSACTIONS = 'n_expense_transactions'
+    N_UNRECOGNIZED_EXPENSE_TRANSACTIONS = 'n_unrecognized_expense_transactions'
+    DAY_OF_LAST_TRANSACTION = 'day_of_last_transaction'
+
+
 class TransactionType(StrEnum):
     INCOME = 'income'
     OUTCOME = 'outcome'
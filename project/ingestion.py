@@ -0,0 +1,277 @@
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from project.constants import PARSING_MAX_WORKERS
+from project.transactions_read import (
+    PARSER_BY_SOURCE_TYPE,
+    CsvFile,
+    add_source_columns,
+    parse_csv_file_chunks,
+    parse_csv_files,
+)
+from project.utils import calculate_md5, hash_string
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ManifestEntry:
+    relative_path: str
+    source_type: str
+    size: int
+    mtime_ns: int
+    content_md5: str
+    parser_version: int
+
+    @property
+    def cache_file_name(self) -> str:
+        # keyed by content, so renamed or duplicated files share the parsed data
+        return f"{self.content_md5}_{self.source_type}_v{self.parser_version}.parquet"
+
+
+class IngestionManifest:
+    """
+    Persistent record of already parsed input files.
+
+    Each entry describes the file as it was when it was parsed, the parsed
+    dataframe itself lives in `cache_dir` under `ManifestEntry.cache_file_name`.
+    """
+
+    def __init__(self, *, file_path: str, cache_dir: str) -> None:
+        self.file_path = file_path
+        self.cache_dir = cache_dir
+        self.entries: dict[str, ManifestEntry] = {}
+        self.is_modified = False
+
+    def read(self) -> None:
+        try:
+            log.info(f"Trying to read ingestion manifest from {self.file_path}")
+            df = pd.read_csv(self.file_path, dtype={"content_md5": str})
+        except (OSError, ValueError):
+            log.info(f"Couldn't read ingestion manifest from {self.file_path}")
+            return
+        for r in df.to_dict(orient="records"):
+            entry = ManifestEntry(**r)
+            self.entries[entry.relative_path] = entry
+        log.info(f"Read ingestion manifest with {len(self.entries)} entries")
+
+    def write(self) -> None:
+        df = pd.DataFrame([asdict(e) for e in self.entries.values()])
+        tmp_file_path = f"{self.file_path}.tmp"
+        df.to_csv(tmp_file_path, index=False)
+        os.replace(tmp_file_path, self.file_path)
+        self.is_modified = False
+
+    def cache_file_path(self, entry: ManifestEntry) -> str:
+        return os.path.join(self.cache_dir, entry.cache_file_name)
+
+    def get_valid_entry(self, csv_file: CsvFile) -> ManifestEntry | None:
+        """
+        Returns the entry of a file whose parsed dataframe can be taken from
+        the cache. Size and mtime are checked first, content is hashed only
+        when they differ (e.g. the file was touched or copied).
+        """
+        entry = self.entries.get(csv_file.relative_path)
+        parser_version = PARSER_BY_SOURCE_TYPE[csv_file.source_type.name].version
+        if (
+            entry is None
+            or entry.source_type != csv_file.source_type.name
+            or entry.parser_version != parser_version
+            or not os.path.isfile(self.cache_file_path(entry))
+        ):
+            return None
+
+        stat = os.stat(csv_file.path)
+        if entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            return entry
+        if entry.size != stat.st_size:
+            return None
+        if calculate_md5(csv_file.path) != entry.content_md5:
+            return None
+
+        entry.mtime_ns = stat.st_mtime_ns
+        self.is_modified = True
+        return entry
+
+    @staticmethod
+    def _new_entry(csv_file: CsvFile) -> ManifestEntry:
+        stat = os.stat(csv_file.path)
+        return ManifestEntry(
+            relative_path=csv_file.relative_path,
+            source_type=csv_file.source_type.name,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            content_md5=calculate_md5(csv_file.path),
+            parser_version=PARSER_BY_SOURCE_TYPE[csv_file.source_type.name].version,
+        )
+
+    def update(self, csv_file: CsvFile) -> ManifestEntry:
+        entry = self._new_entry(csv_file)
+        self.entries[entry.relative_path] = entry
+        self.is_modified = True
+        return entry
+
+    def fingerprint(self, csv_files: list[CsvFile]) -> str:
+        """
+        Identifies the content of `csv_files` by their cache file names, without
+        parsing them. Only new or modified files are hashed.
+        """
+        parts = []
+        for csv_file in csv_files:
+            entry = self.get_valid_entry(csv_file) or self._new_entry(csv_file)
+            parts.append((csv_file.relative_path, entry.cache_file_name))
+        return hash_string(repr(parts))
+
+    def prune(self, csv_files: list[CsvFile]) -> None:
+        """Drops entries of removed files and cache files nobody refers to."""
+        relative_paths = {csv_file.relative_path for csv_file in csv_files}
+        for relative_path in list(self.entries.keys()):
+            if relative_path not in relative_paths:
+                del self.entries[relative_path]
+                self.is_modified = True
+
+        used_file_names = {e.cache_file_name for e in self.entries.values()}
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".parquet") and file_name not in used_file_names:
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+
+def _read_cached_df(file_path: str) -> pd.DataFrame | None:
+    try:
+        return pd.read_parquet(file_path)
+    except Exception as e:
+        log.warning(f"Couldn't read parsed file cache {file_path}: {e}")
+        return None
+
+
+def _write_cached_df(df: pd.DataFrame, file_path: str) -> None:
+    tmp_file_path = f"{file_path}.tmp"
+    try:
+        df.to_parquet(tmp_file_path, index=False)
+    except Exception as e:
+        log.warning(f"Couldn't write parsed file cache {file_path}: {e}")
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        return
+    os.replace(tmp_file_path, file_path)
+
+
+def read_csv_files_incrementally(
+    csv_files: list[CsvFile],
+    manifest: IngestionManifest,
+    max_workers: int = PARSING_MAX_WORKERS,
+) -> pd.DataFrame:
+    """
+    Same output as `parse_csv_files_as_df`, but only new or modified files are
+    parsed, the rest is loaded from the parsed files cache.
+    """
+    dfs: list[pd.DataFrame | None] = []
+    for csv_file in csv_files:
+        entry = manifest.get_valid_entry(csv_file)
+        dfs.append(_read_cached_df(manifest.cache_file_path(entry)) if entry else None)
+
+    i_stale_files = [i for i, df in enumerate(dfs) if df is None]
+    stale_files = [csv_files[i] for i in i_stale_files]
+    for i_file, df in zip(i_stale_files, parse_csv_files(stale_files, max_workers)):
+        df = df.reset_index(drop=True)
+        entry = manifest.update(csv_files[i_file])
+        _write_cached_df(df, manifest.cache_file_path(entry))
+        dfs[i_file] = df
+
+    manifest.prune(csv_files)
+    if manifest.is_modified:
+        manifest.write()
+
+    log.info(
+        f"Parsed {len(stale_files)} of {len(csv_files)} files, the rest read from cache"
+    )
+    return pd.concat(
+        [add_source_columns(df, f) for f, df in zip(csv_files, dfs)],
+        ignore_index=True,
+    )
+
+
+def _open_cached_file(file_path: str) -> pq.ParquetFile | None:
+    try:
+        return pq.ParquetFile(file_path)
+    except Exception as e:
+        log.warning(f"Couldn't read parsed file cache {file_path}: {e}")
+        return None
+
+
+def _parse_and_cache_chunks(
+    csv_file: CsvFile, file_path: str, chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    """
+    Parsed chunks of the file, each also appended as a row group to its
+    parsed file cache, which is complete once the last chunk is returned.
+    """
+    tmp_file_path = f"{file_path}.tmp"
+    writer: pq.ParquetWriter | None = None
+    try:
+        for df in parse_csv_file_chunks(csv_file, chunk_size):
+            df = df.reset_index(drop=True)
+            table = pa.Table.from_pandas(
+                df, schema=writer.schema if writer else None, preserve_index=False
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_file_path, table.schema)
+            writer.write_table(table)
+            yield df
+    except BaseException:
+        # also when not read to the end
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        raise
+    if writer is not None:
+        writer.close()
+        os.replace(tmp_file_path, file_path)
+
+
+def iter_csv_files_chunks(
+    csv_files: list[CsvFile],
+    manifest: IngestionManifest,
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    Same rows as `read_csv_files_incrementally`, in dataframes of at most
+    `chunk_size` rows (whole files for parsers not reading in chunks), so
+    that only one chunk is in memory at a time. New or modified files are
+    parsed serially.
+    """
+    n_parsed_files = 0
+    for csv_file in csv_files:
+        entry = manifest.get_valid_entry(csv_file)
+        cached_file = (
+            _open_cached_file(manifest.cache_file_path(entry)) if entry else None
+        )
+        if cached_file is not None:
+            dfs = (
+                batch.to_pandas()
+                for batch in cached_file.iter_batches(batch_size=chunk_size)
+            )
+        else:
+            entry = manifest.update(csv_file)
+            dfs = _parse_and_cache_chunks(
+                csv_file, manifest.cache_file_path(entry), chunk_size
+            )
+            n_parsed_files += 1
+        for df in dfs:
+            yield add_source_columns(df, csv_file)
+
+    manifest.prune(csv_files)
+    if manifest.is_modified:
+        manifest.write()
+
+    log.info(
+        f"Parsed {n_parsed_files} of {len(csv_files)} files in chunks, "
+        "the rest read from cache"
+    )
@@ -1,11 +1,12 @@
 from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
 from project.constants import UNRECOGNIZED
-from project.transactions_filters import filter_transactions
-from project.enums import TransactionColumn
+from project.enums import MetricColumn, TransactionColumn, TransactionType
+from project.transactions_rollup import MonthlyRollup
 from project.dates_utils import get_past_month_start_datetime
-import streamlit as st
 
 
 @dataclass(frozen=False)
@@ -14,6 +15,7 @@ class Metric:
     value: int | str | float | None
     delta: int | str | float | None
     delta_inverse: bool | None
+    history: list[int | float | None] | None = None  # oldest first
 
     def __post_init__(self):
         if isinstance(self.value, float):
@@ -22,196 +24,129 @@ class Metric:
             self.delta = round(self.delta, 2)
 
 
-@st.cache_data
-def _get_month_transactions_df(
-    transactions_df: pd.DataFrame,
-    year_and_month: tuple[int, int],
-    type: str,
-    category: str | None = None,
+def get_metrics_history(
+    rollup: MonthlyRollup, n_months: int, n_months_back: int = 0
 ) -> pd.DataFrame:
-    return filter_transactions(
-        transactions_df=transactions_df,
-        exact_year_and_month=year_and_month,
-        categories=[category] if category else None,
-        types=[type],
-    )
-
-
-def _compute_total_monthly_amount_abs(
-    transactions_df: pd.DataFrame,
-    year_and_month: tuple[int, int],
-    type: str,
-    category: str | None = None,
-):
-    month_transactions_df = _get_month_transactions_df(
-        transactions_df=transactions_df,
-        year_and_month=year_and_month,
-        type=type,
-        category=category,
-    )
-    return month_transactions_df["amount_abs"].sum()
-
-
-def _compute_total_monthly_n_transactions(
-    transactions_df: pd.DataFrame,
-    year_and_month: tuple[int, int],
-    type: str,
-    category: str | None = None,
-):
-    month_transactions_df = _get_month_transactions_df(
-        transactions_df=transactions_df,
-        year_and_month=year_and_month,
-        type=type,
-        category=category,
-    )
-    return len(month_transactions_df)
-
-
-def compute_total_monthly_income(
-    transactions_df: pd.DataFrame, year_and_month: tuple[int, int]
-):
-    return _compute_total_monthly_amount_abs(
-        transactions_df=transactions_df, year_and_month=year_and_month, type='income'
-    )
-
-
-def compute_total_monthly_expense(
-    transactions_df: pd.DataFrame, year_and_month: tuple[int, int]
-):
-    return _compute_total_monthly_amount_abs(
-        transactions_df=transactions_df, year_and_month=year_and_month, type='outcome'
-    )
-
-
-def compute_total_monthly_savings(
-    transactions_df: pd.DataFrame, year_and_month: tuple[int, int]
-):
-    return compute_total_monthly_income(
-        transactions_df, year_and_month
-    ) - compute_total_monthly_expense(transactions_df, year_and_month)
-
-
-def compute_total_monthly_n_income_transactions(
-    transactions_df: pd.DataFrame, year_and_month: tuple[int, int]
-):
-    return _compute_total_monthly_n_transactions(
-        transactions_df=transactions_df, year_and_month=year_and_month, type='income'
-    )
-
-
-def compute_total_monthly_n_expense_transactions(
-    transactions_df: pd.DataFrame, year_and_month: tuple[int, int], category=None
-):
-    return _compute_total_monthly_n_transactions(
-        transactions_df=transactions_df,
-        year_and_month=year_and_month,
-        type='outcome',
-        category=category,
-    )
-
-
-def get_day_of_last_transaction(
-    transactions_df: pd.DataFrame, year_and_month: tuple[int, int]
-):
-    month_transaction_df = _get_month_transactions_df(
-        transactions_df=transactions_df,
-        year_and_month=year_and_month,
-        type='outcome',
-    )
-    return (
-        month_transaction_df[TransactionColumn.TRANSACTION_DATE].sort_values().iloc[-1]
-    ).day
-
-
-def get_metric(
-    transactions_df: pd.DataFrame,
-    year_and_month: tuple[int, int],
-    reference_year_and_month: tuple[int, int],
-    func: callable,
-    delta_inverse: bool,
-    name: str,
-    **func_args,
-) -> Metric:
-    pass
-
-    value = func(transactions_df, year_and_month, **func_args)
-    reference_value = func(transactions_df, reference_year_and_month, **func_args)
-
-    return Metric(
-        name=name,
-        value=value,
-        delta=value - reference_value,
-        delta_inverse=delta_inverse,
+    """
+    All monthly metrics of the `n_months` months ending `n_months_back` months
+    ago, one row per month (oldest first), computed in one grouped pass over
+    the rollup.
+    """
+    months = [
+        get_past_month_start_datetime(n_months_back=n_months_back + i)
+        for i in reversed(range(n_months))
+    ]
+    year_months = [month.year * 100 + month.month for month in months]
+
+    df = rollup.df.reset_index()
+    df = df[df[TransactionColumn.YEAR_MONTH].isin(year_months)]
+    is_unrecognized = df[TransactionColumn.CATEGORY] == UNRECOGNIZED
+    aggregations = {
+        TransactionColumn.AMOUNT_ABS: (TransactionColumn.AMOUNT_ABS, "sum"),
+        TransactionColumn.N_TRANSACTIONS: (TransactionColumn.N_TRANSACTIONS, "sum"),
+        MetricColumn.N_UNRECOGNIZED_EXPENSE_TRANSACTIONS: (
+            MetricColumn.N_UNRECOGNIZED_EXPENSE_TRANSACTIONS,
+            "sum",
+        ),
+        TransactionColumn.MAX_DATE: (TransactionColumn.MAX_DATE, "max"),
+    }
+    totals_df = (
+        df.assign(
+            **{
+                MetricColumn.N_UNRECOGNIZED_EXPENSE_TRANSACTIONS: df[
+                    TransactionColumn.N_TRANSACTIONS
+                ].where(is_unrecognized, 0)
+            }
+        )
+        .groupby([TransactionColumn.YEAR_MONTH, TransactionColumn.TYPE], observed=True)
+        .agg(**aggregations)
+        .unstack(TransactionColumn.TYPE)
+        .reindex(
+            index=year_months,
+            columns=pd.MultiIndex.from_product(
+                [list(aggregations), [TransactionType.INCOME, TransactionType.OUTCOME]]
+            ),
+        )
     )
 
-
-def get_metrics(transactions_df: pd.DataFrame, n_months_back: int) -> list[Metric]:
-    last_month_datetime = get_past_month_start_datetime(n_months_back=n_months_back)
-    second_to_last_month_datetime = get_past_month_start_datetime(
-        n_months_back=n_months_back + 1
-    )
-    last_month_year_and_month = (last_month_datetime.year, last_month_datetime.month)
-    second_to_last_month_year_and_month = (
-        second_to_last_month_datetime.year,
-        second_to_last_month_datetime.month,
+    income = totals_df[(TransactionColumn.AMOUNT_ABS, TransactionType.INCOME)]
+    expense = totals_df[(TransactionColumn.AMOUNT_ABS, TransactionType.OUTCOME)]
+    history_df = pd.DataFrame(
+        {
+            MetricColumn.INCOME: income.fillna(0.0).to_numpy(dtype=float),
+            MetricColumn.EXPENSE: expense.fillna(0.0).to_numpy(dtype=float),
+            MetricColumn.SAVINGS: (income.fillna(0.0) - expense.fillna(0.0)).to_numpy(
+                dtype=float
+            ),
+            MetricColumn.N_EXPENSE_TRANSACTIONS: totals_df[
+                (TransactionColumn.N_TRANSACTIONS, TransactionType.OUTCOME)
+            ]
+            .fillna(0)
+            .to_numpy(dtype=int),
+            MetricColumn.N_UNRECOGNIZED_EXPENSE_TRANSACTIONS: totals_df[
+                (
+                    MetricColumn.N_UNRECOGNIZED_EXPENSE_TRANSACTIONS,
+                    TransactionType.OUTCOME,
+                )
+            ]
+            .fillna(0)
+            .to_numpy(dtype=int),
+            MetricColumn.DAY_OF_LAST_TRANSACTION: pd.to_datetime(
+                totals_df[(TransactionColumn.MAX_DATE, TransactionType.OUTCOME)]
+            )
+            .dt.day.astype("Int64")
+            .to_numpy(),
+        },
+        index=pd.DatetimeIndex(months, name="month"),
     )
-
-    last_month_n_unrecognized_expense_transactions = (
-        compute_total_monthly_n_expense_transactions(
-            transactions_df=transactions_df,
-            year_and_month=last_month_year_and_month,
-            category=UNRECOGNIZED,
+    return history_df
+
+
+def _to_metric_value(value) -> int | float | None:
+    if pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def get_metrics(history_df: pd.DataFrame) -> list[Metric]:
+    """
+    Metrics of the last month of `history_df` (see `get_metrics_history`, at
+    least two months), with deltas to the month before and all its months as
+    history.
+    """
+    month_name = history_df.index[-1].strftime('%B %Y')
+
+    def get_metric(
+        column: MetricColumn, name: str, delta_inverse: bool | None
+    ) -> Metric:
+        values = [_to_metric_value(v) for v in history_df[column]]
+        return Metric(
+            name=f"{month_name} {name}",
+            value=values[-1],
+            delta=(
+                None if delta_inverse is None else (values[-1] or 0) - (values[-2] or 0)
+            ),
+            delta_inverse=delta_inverse,
+            history=values,
         )
-    )
 
-    metrics = [
+    return [
+        get_metric(MetricColumn.INCOME, "total income", delta_inverse=False),
+        get_metric(MetricColumn.EXPENSE, "total expenses", delta_inverse=True),
+        get_metric(MetricColumn.SAVINGS, "total savings", delta_inverse=False),
         get_metric(
-            transactions_df=transactions_df,
-            year_and_month=last_month_year_and_month,
-            reference_year_and_month=second_to_last_month_year_and_month,
-            func=compute_total_monthly_income,
-            delta_inverse=False,
-            name=f"{last_month_datetime.strftime('%B %Y')} total income",
-        ),
-        get_metric(
-            transactions_df=transactions_df,
-            year_and_month=last_month_year_and_month,
-            reference_year_and_month=second_to_last_month_year_and_month,
-            func=compute_total_monthly_expense,
+            MetricColumn.N_EXPENSE_TRANSACTIONS,
+            "number of transactions",
             delta_inverse=True,
-            name=f"{last_month_datetime.strftime('%B %Y')} total expenses",
-        ),
-        get_metric(
-            transactions_df=transactions_df,
-            year_and_month=last_month_year_and_month,
-            reference_year_and_month=second_to_last_month_year_and_month,
-            func=compute_total_monthly_savings,
-            delta_inverse=False,
-            name=f"{last_month_datetime.strftime('%B %Y')} total savings",
         ),
         get_metric(
-            transactions_df=transactions_df,
-            year_and_month=last_month_year_and_month,
-            reference_year_and_month=second_to_last_month_year_and_month,
-            func=compute_total_monthly_n_expense_transactions,
-            delta_inverse=True,
-            name=f"{last_month_datetime.strftime('%B %Y')} number of transactions",
-        ),
-        Metric(
-            name=f"{last_month_datetime.strftime('%B %Y')} not recognized expense transactions",
-            value=last_month_n_unrecognized_expense_transactions,
-            delta=None,
+            MetricColumn.N_UNRECOGNIZED_EXPENSE_TRANSACTIONS,
+            "not recognized expense transactions",
             delta_inverse=None,
         ),
-        Metric(
-            name=f"{last_month_datetime.strftime('%B %Y')} day of last recorded transaction",
-            value=get_day_of_last_transaction(
-                transactions_df=transactions_df,
-                year_and_month=last_month_year_and_month,
-            ),
-            delta=None,
+        get_metric(
+            MetricColumn.DAY_OF_LAST_TRANSACTION,
+            "day of last recorded transaction",
             delta_inverse=None,
         ),
     ]
-
-    return metrics
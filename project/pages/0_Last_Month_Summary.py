@@ -1,12 +1,14 @@
+import pandas as pd
 import streamlit as st
 from project import app_data
 from project.utils import get_emoji
 from project.dates_utils import get_past_month_start_datetime
-from project.metrics import get_metrics
+from project.enums import MetricColumn
+from project.metrics import get_metrics, get_metrics_history
+from project.settings import SQL_BACKEND_ENABLED
+from project.transactions_rollup import get_monthly_rollup
 
 
-_, all_transactions_df = app_data.read_fresh_data()
-
 n_months_back = st.pills(
     "Month",
     [0, 1, 2],
@@ -16,10 +18,14 @@ n_months_back = st.pills(
 )
 
 
-metrics = get_metrics(
-    all_transactions_df[all_transactions_df['category'] != 'own-transfer'],
-    n_months_back=n_months_back,
-)
+if SQL_BACKEND_ENABLED:
+    rollup = app_data.read_sql_store().get_monthly_rollup()
+else:
+    _, dataset = app_data.read_fresh_data()
+    rollup = get_monthly_rollup(dataset)
+rollup = rollup.exclude_categories(['own-transfer'])
+history_df = get_metrics_history(rollup, n_months=12, n_months_back=n_months_back)
+metrics = get_metrics(history_df)
 
 for metric in metrics:
     st.metric(
@@ -28,3 +34,18 @@ for metric in metrics:
         delta=metric.delta,
         delta_color="inverse" if metric.delta_inverse else "normal",
     )
+    st.line_chart(
+        pd.Series(metric.history, index=history_df.index, dtype=float),
+        height=100,
+    )
+
+st.subheader("Last 12 months")
+n_months_rolling = st.slider("Rolling average months", 1, 6, value=3)
+amounts_columns = [MetricColumn.INCOME, MetricColumn.EXPENSE, MetricColumn.SAVINGS]
+st.line_chart(
+    history_df[amounts_columns]
+    .rolling(n_months_rolling, min_periods=1)
+    .mean()
+    .add_suffix(f" ({n_months_rolling}M avg)")
+    .join(history_df[amounts_columns])
+)
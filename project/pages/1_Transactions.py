@@ -4,26 +4,26 @@ import streamlit_antd_components as sac
 
 
 from project.categories import add_category_rule
-from project.constants import UNRECOGNIZED
+from project.constants import TREE_MAX_LEAVES, UNRECOGNIZED
 from project.dates_utils import get_past_month_start_datetime
-from project.transactions_tree import get_sac_tree_items
+from project.transactions_tree import TreeExpansion, get_lazy_sac_tree_items
 from project.utils import get_emoji
 
 
 from datetime import datetime, timedelta
 import logging
 import pandas as pd
-from project.settings import CATEGORIES_RULES_FILE_PATH
+from project.settings import CATEGORIES_RULES_FILE_PATH, SQL_BACKEND_ENABLED
 from project.dates_utils import NOW
-from project.transactions_state import get_state_transactions_df
+from project.transactions_state import prepare_state_transactions_df
 from project.transactions_aggregation import (
     FREQUENCIES,
-    get_time_aggregated_summarized_delta_df,
-    get_time_aggregated_transactions_df,
+    get_time_aggregated_income_expense_delta_dfs,
 )
 from project.transactions_read import TransactionColumn
 from project.barplot import get_barplot
-from project.app_data import read_fresh_data
+from project.range_totals import get_transactions_totals_df
+from project.app_data import read_dataset_range, read_sql_store
 
 log = logging.getLogger(__name__)
 if not logging.getLogger().hasHandlers():
@@ -31,7 +31,9 @@ if not logging.getLogger().hasHandlers():
         level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
     )
 
-all_categories, all_transactions_df = read_fresh_data()
+if SQL_BACKEND_ENABLED:
+    sql_store = read_sql_store()
+    all_categories = sql_store.categories
 
 
 @st.dialog("Create categories rule")
@@ -108,6 +110,11 @@ with expenses_container:
             hours=23, minutes=59, seconds=59
         )
 
+    if not SQL_BACKEND_ENABLED:
+        # only the months of the date range are read
+        dataset = read_dataset_range(start_date, end_date)
+        all_categories = list(dataset.categories)
+
     pills_container = st.container()
 
     with pills_container:
@@ -185,27 +192,27 @@ with expenses_container:
             "Number of groups", min_value=1, max_value=50, value=7, step=1
         )
 
-    state_transactions_df = get_state_transactions_df(
-        all_transactions_df=all_transactions_df,
-        categories=categories,
-        start_date=start_date,
-        end_date=end_date,
-        group_by_col=group_by_col,
-        n_biggest_groups=n_biggest_groups,
-        order_by_command=order_by_command,
-    )
+    if SQL_BACKEND_ENABLED:
+        state_transactions_df = prepare_state_transactions_df(
+            sql_store.filter_transactions(start_date, end_date, categories=categories),
+            group_by_col=group_by_col,
+            n_biggest_groups=n_biggest_groups,
+            order_by_command=order_by_command,
+        )
+    else:
+        # the dataset holds the transactions of the date range only
+        range_df = dataset.df
+        state_transactions_df = prepare_state_transactions_df(
+            range_df[range_df[TransactionColumn.CATEGORY].isin(categories)],
+            group_by_col=group_by_col,
+            n_biggest_groups=n_biggest_groups,
+            order_by_command=order_by_command,
+        )
 
-    _df_income = get_time_aggregated_transactions_df(
-        state_transactions_df[state_transactions_df["type"] == "income"],
-        frequency=frequency,
-    )
-    _df_expense = get_time_aggregated_transactions_df(
-        state_transactions_df[state_transactions_df["type"] == "outcome"],
-        frequency=frequency,
+    _df_income, _df_expense, _df_delta = get_time_aggregated_income_expense_delta_dfs(
+        state_transactions_df, frequency=frequency
     )
 
-    _df_delta = get_time_aggregated_summarized_delta_df(_df_income, _df_expense)
-
     if len(state_transactions_df) == 0:
         st.toast('All transactions were excluded! Change filters ;)', icon="🚨")
 
@@ -228,6 +235,24 @@ with expenses_container:
             _df_expense.transpose(),
             use_container_width=True,
         )
+        st.caption("Totals in the date range")
+        st.dataframe(
+            (
+                sql_store.get_range_totals_df(
+                    group_by_col=group_by_col,
+                    categories=categories,
+                    start_datetime=start_date,
+                    end_datetime=end_date,
+                )
+                if SQL_BACKEND_ENABLED
+                else get_transactions_totals_df(state_transactions_df, group_by_col)
+            ),
+            use_container_width=True,
+            column_config={
+                column: st.column_config.NumberColumn(format="%.2f")
+                for column in ["income", "outcome", "delta"]
+            },
+        )
 
     # table
     with transactions_table_tab:
@@ -319,14 +344,34 @@ with expenses_container:
         if swap_tree:
             nesting_cols.reverse()
 
-        items = get_sac_tree_items(
-            transactions_df=state_transactions_df, nesting_cols=nesting_cols
+        expansion = st.session_state.setdefault(
+            "transactions_tree_expansion", TreeExpansion()
+        )
+        expansion.reset(nesting_cols)
+        items, nodes = get_lazy_sac_tree_items(
+            transactions_df=state_transactions_df,
+            nesting_cols=nesting_cols,
+            expansion=expansion,
+            max_leaves=TREE_MAX_LEAVES,
+            expand_all=open_all,
         )
 
-        sac.tree(
+        selected_index = sac.tree(
             items,
             width=1000,
             size='lg',
-            open_index=0,
+            open_index=[
+                i
+                for i, node in enumerate(nodes)
+                if node.kind == 'group' and node.path in expansion.expanded_paths
+            ]
+            or 0,
             open_all=open_all,
+            return_index=True,
+            # new tree after every expansion, so that nothing is selected
+            key=f"transactions_tree_{expansion.n_changes}",
         )
+        if selected_index is not None and expansion.select(
+            nodes[selected_index], max_leaves=TREE_MAX_LEAVES
+        ):
+            st.rerun()
@@ -0,0 +1,31 @@
+import streamlit as st
+
+from project.app_data import read_dataset
+from project.caching import clear_caches, estimate_n_bytes, get_caches_stats
+
+dataset = read_dataset()
+
+st.subheader("Dataset")
+st.write(
+    f"Version `{dataset.version[:12]}`, {len(dataset.df)} transactions, "
+    f"{estimate_n_bytes(dataset.df) / 1024**2:.1f} MB"
+)
+
+st.subheader("Caches")
+caches_stats_df = get_caches_stats()
+caches_stats_df[["n_bytes", "max_bytes"]] /= 1024**2
+caches_stats_df["hit_ratio"] = caches_stats_df["hits"] / (
+    caches_stats_df["hits"] + caches_stats_df["misses"]
+).where(lambda n_calls: n_calls > 0)
+st.dataframe(
+    caches_stats_df,
+    hide_index=True,
+    column_config={
+        "n_bytes": st.column_config.NumberColumn(label="size MB", format="%.1f"),
+        "max_bytes": st.column_config.NumberColumn(label="max size MB", format="%.0f"),
+        "hit_ratio": st.column_config.ProgressColumn(min_value=0, max_value=1),
+    },
+)
+if st.button("Clear caches"):
+    clear_caches()
+    st.rerun()
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from project.caching import memoize
+from project.dataset import Dataset
+from project.enums import TransactionColumn
+
+log = logging.getLogger(__name__)
+
+# points to the directory of the current partitions, replaced atomically
+_METADATA_FILE_NAME = "current.json"
+# zero rows, read when no partition intersects the requested range
+_SCHEMA_FILE_NAME = "schema.parquet"
+
+
+def _to_year_month(date: datetime) -> int:
+    return date.year * 100 + date.month
+
+
+def _get_partition_dir(root_dir: str, year_month: int) -> str:
+    year, month = divmod(year_month, 100)
+    return os.path.join(root_dir, f"year={year}", f"month={month:02d}")
+
+
+class PartitionedStore:
+    """
+    Enriched transactions saved as one parquet file per year and month
+    (`year=2024/month=05/transactions.parquet`), so that a date range query
+    reads only the partitions intersecting it.
+
+    Every write goes to a new sub-directory, made current by replacing the
+    metadata file pointing to it. The previous sub-directory is kept for
+    readers still using it, older ones are removed.
+    """
+
+    def __init__(self, *, root_dir: str) -> None:
+        self.root_dir = root_dir
+
+    def _read_metadata(self) -> dict:
+        try:
+            with open(os.path.join(self.root_dir, _METADATA_FILE_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            log.warning(f"Couldn't read partitions metadata of {self.root_dir}: {e}")
+            return {}
+
+    @property
+    def version(self) -> str | None:
+        return self._read_metadata().get("version")
+
+    def write(self, dataset: Dataset) -> None:
+        """Replaces all partitions with the dataset."""
+        previous_dir_name = self._read_metadata().get("dir_name")
+        dir_name = f"{dataset.version[:12]}_{time.time_ns()}"
+        tmp_dir = os.path.join(self.root_dir, f"{dir_name}.tmp")
+        os.makedirs(tmp_dir)
+
+        df = dataset.df
+        # of the full frame, columns all null in some months (e.g. description
+        # without any mbank transaction) keep their type in every partition
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        pq.write_table(
+            pa.Table.from_pandas(df.iloc[:0], schema=schema, preserve_index=False),
+            os.path.join(tmp_dir, _SCHEMA_FILE_NAME),
+        )
+        year_months = []
+        for year_month, partition_df in df.groupby(
+            TransactionColumn.YEAR_MONTH, sort=True
+        ):
+            partition_dir = _get_partition_dir(tmp_dir, int(year_month))
+            os.makedirs(partition_dir)
+            pq.write_table(
+                pa.Table.from_pandas(partition_df, schema=schema, preserve_index=False),
+                os.path.join(partition_dir, "transactions.parquet"),
+            )
+            year_months.append(int(year_month))
+        os.replace(tmp_dir, os.path.join(self.root_dir, dir_name))
+
+        metadata_file_path = os.path.join(self.root_dir, _METADATA_FILE_NAME)
+        with open(f"{metadata_file_path}.tmp", "w") as f:
+            json.dump(
+                {
+                    "version": dataset.version,
+                    "dir_name": dir_name,
+                    "categories": list(dataset.categories),
+                    "year_months": year_months,
+                },
+                f,
+            )
+        os.replace(f"{metadata_file_path}.tmp", metadata_file_path)
+
+        for file_name in os.listdir(self.root_dir):
+            file_path = os.path.join(self.root_dir, file_name)
+            if os.path.isdir(file_path) and file_name not in (
+                dir_name,
+                previous_dir_name,
+            ):
+                shutil.rmtree(file_path, ignore_errors=True)
+        log.info(f"Saved {len(year_months)} monthly partitions to {self.root_dir}")
+
+    def read(
+        self,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> Dataset:
+        """
+        Transactions within the dates, read from the partitions intersecting
+        them only. Without dates it's the full history.
+        """
+        metadata = self._read_metadata()
+        if not metadata:
+            raise FileNotFoundError(f"No partitions saved in {self.root_dir}")
+        year_months = [
+            year_month
+            for year_month in metadata["year_months"]
+            if (start_datetime is None or year_month >= _to_year_month(start_datetime))
+            and (end_datetime is None or year_month <= _to_year_month(end_datetime))
+        ]
+        return read_partitions(
+            os.path.join(self.root_dir, metadata["dir_name"]),
+            metadata["version"],
+            tuple(metadata["categories"]),
+            tuple(year_months),
+            start_datetime,
+            end_datetime,
+        )
+
+
+@memoize()
+def read_partitions(
+    partitions_dir: str,
+    version: str,
+    categories: tuple[str, ...],
+    year_months: tuple[int, ...],
+    start_datetime: datetime | None = None,
+    end_datetime: datetime | None = None,
+) -> Dataset:
+    file_paths = [
+        os.path.join(
+            _get_partition_dir(partitions_dir, year_month), "transactions.parquet"
+        )
+        for year_month in year_months
+    ] or [os.path.join(partitions_dir, _SCHEMA_FILE_NAME)]
+
+    # the dates are also pushed down to the row groups of the partitions
+    date = ds.field(TransactionColumn.TRANSACTION_DATE)
+    date_filter = ds.scalar(True)
+    if start_datetime:
+        date_filter = date_filter & (date >= pd.Timestamp(start_datetime))
+    if end_datetime:
+        date_filter = date_filter & (date <= pd.Timestamp(end_datetime))
+    schema = pq.read_schema(os.path.join(partitions_dir, _SCHEMA_FILE_NAME))
+    table = ds.dataset(file_paths, schema=schema, format="parquet").to_table(
+        filter=date_filter
+    )
+    df = table.to_pandas()
+    log.info(f"Read {len(df)} transactions from {len(year_months)} partitions")
+    return Dataset(
+        df=df,
+        version=f"{version}:{start_datetime}:{end_datetime}",
+        categories=categories,
+    )
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from project.enums import TransactionColumn, TransactionType
+
+
+def get_transactions_totals_df(
+    transactions_df: pd.DataFrame, group_by_col: str
+) -> pd.DataFrame:
+    """
+    Income, expense, delta and number of transactions of every group, of
+    transactions already filtered by dates and categories, e.g. the few
+    months read from partitions.
+    """
+    totals_df = (
+        transactions_df.groupby([group_by_col, TransactionColumn.TYPE], observed=True)
+        .agg(
+            **{
+                TransactionColumn.AMOUNT_ABS: (TransactionColumn.AMOUNT_ABS, "sum"),
+                TransactionColumn.N_TRANSACTIONS: (
+                    TransactionColumn.AMOUNT_ABS,
+                    "size",
+                ),
+            }
+        )
+        .reset_index()
+    )
+    return _to_range_totals_df(totals_df, group_by_col)
+
+
+def _to_range_totals_df(totals_df: pd.DataFrame, group_by_col: str) -> pd.DataFrame:
+    range_totals_df = totals_df.pivot_table(
+        index=group_by_col,
+        columns=TransactionColumn.TYPE,
+        values=TransactionColumn.AMOUNT_ABS,
+        aggfunc="sum",
+        fill_value=0.0,
+        observed=True,
+    ).reindex(columns=[TransactionType.INCOME, TransactionType.OUTCOME], fill_value=0.0)
+    range_totals_df.columns = list(range_totals_df.columns)
+    range_totals_df[TransactionColumn.DELTA] = (
+        range_totals_df[TransactionType.INCOME]
+        - range_totals_df[TransactionType.OUTCOME]
+    )
+    range_totals_df[TransactionColumn.N_TRANSACTIONS] = totals_df.groupby(
+        group_by_col, observed=True
+    )[TransactionColumn.N_TRANSACTIONS].sum()
+    return range_totals_df[range_totals_df[TransactionColumn.N_TRANSACTIONS] > 0]
@@ -7,6 +7,13 @@ from project.constants import (
     TRANSACTIONS_FILES_DIR,
     CATEGORIES_CACHE_FILE_PATH,
     CATEGORIES_RULES_FILE_PATH,
+    INGESTION_MANIFEST_FILE_PATH,
+    PARSED_FILES_CACHE_DIR,
+    DATASET_SNAPSHOT_FILE_PATH,
+    PARTITIONED_DATASET_DIR,
+    INGESTION_CHUNK_SIZE,
+    SQL_STORE_FILE_PATH,
+    SQL_BACKEND_ENABLED,
 )
 
 if not os.path.isdir(ROOT_INPUT_FILES_DIR):
@@ -36,3 +43,4 @@ if not os.path.isdir(ROOT_INPUT_FILES_DIR):
 os.makedirs(TRANSACTIONS_FILES_DIR, exist_ok=True)
 os.makedirs(Path(CATEGORIES_RULES_FILE_PATH).parent, exist_ok=True)
 os.makedirs(Path(CATEGORIES_CACHE_FILE_PATH).parent, exist_ok=True)
+os.makedirs(PARSED_FILES_CACHE_DIR, exist_ok=True)
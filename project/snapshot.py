@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+
+import pyarrow as pa
+
+from project.dataset import Dataset
+
+log = logging.getLogger(__name__)
+
+# bump when the columns of the saved datasets change, to invalidate old snapshots
+SNAPSHOT_VERSION = 1
+
+_VERSION_KEY = b"money_insights.version"
+_SNAPSHOT_VERSION_KEY = b"money_insights.snapshot_version"
+_CATEGORIES_KEY = b"money_insights.categories"
+
+
+def write_snapshot(dataset: Dataset, file_path: str) -> None:
+    """
+    Saves the dataset as an uncompressed Arrow IPC file, so that it can be
+    memory-mapped by `read_snapshot`.
+    """
+    table = pa.Table.from_pandas(dataset.df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        (table.schema.metadata or {})
+        | {
+            _VERSION_KEY: dataset.version.encode(),
+            _SNAPSHOT_VERSION_KEY: str(SNAPSHOT_VERSION).encode(),
+            _CATEGORIES_KEY: json.dumps(list(dataset.categories)).encode(),
+        }
+    )
+    tmp_file_path = f"{file_path}.tmp"
+    try:
+        with pa.OSFile(tmp_file_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    except Exception as e:
+        log.warning(f"Couldn't write dataset snapshot {file_path}: {e}")
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        return
+    os.replace(tmp_file_path, file_path)
+    log.info(f"Saved dataset snapshot {dataset.version} to {file_path}")
+
+
+def read_snapshot(file_path: str, version: str) -> Dataset | None:
+    """Dataset saved by `write_snapshot`, None if missing or of another version."""
+    try:
+        with pa.memory_map(file_path) as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            if (
+                metadata.get(_VERSION_KEY) != version.encode()
+                or metadata.get(_SNAPSHOT_VERSION_KEY) != str(SNAPSHOT_VERSION).encode()
+            ):
+                log.info(f"Dataset snapshot {file_path} is outdated")
+                return None
+            # one block per column, so that numeric columns without nulls keep
+            # pointing to the mapped file (read-only) instead of being copied
+            df = reader.read_all().to_pandas(split_blocks=True, self_destruct=True)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning(f"Couldn't read dataset snapshot {file_path}: {e}")
+        return None
+
+    log.info(f"Read dataset snapshot {version} from {file_path}")
+    return Dataset(
+        df=df,
+        version=version,
+        categories=tuple(json.loads(metadata[_CATEGORIES_KEY])),
+    )
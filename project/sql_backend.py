@@ -0,0 +1,288 @@
+import json
+import logging
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Iterable
+
+import pandas as pd
+
+from project.dataset import Dataset
+from project.enums import TransactionColumn, TransactionType
+from project.transactions_rollup import ROLLUP_DIMENSIONS, MonthlyRollup
+
+log = logging.getLogger(__name__)
+
+_INDEXED_COLUMNS = [
+    TransactionColumn.CATEGORY,
+    TransactionColumn.TYPE,
+    TransactionColumn.YEAR_MONTH,
+]
+# columns of the transactions table, whatever columns the chunks have (e.g.
+# description of mbank transactions only), text unless listed
+_TABLE_COLUMNS = [
+    column
+    for column in TransactionColumn
+    if column
+    not in (
+        TransactionColumn.GROUP_VALUE,
+        TransactionColumn.DISPLAY_CATEGORY,
+        TransactionColumn.DISPLAY_TYPE,
+        TransactionColumn.N_TRANSACTIONS,
+        TransactionColumn.MAX_DATE,
+        TransactionColumn.MIN_DATE,
+        TransactionColumn.DELTA,
+    )
+]
+_COLUMN_SQL_TYPES = {
+    TransactionColumn.TRANSACTION_DATE: "INTEGER",
+    TransactionColumn.YEAR_MONTH: "INTEGER",
+    TransactionColumn.CATEGORY_RULE_ID: "INTEGER",
+    TransactionColumn.AMOUNT: "REAL",
+    TransactionColumn.AMOUNT_ABS: "REAL",
+}
+
+
+def _to_seconds(date: datetime) -> int:
+    return int(pd.Timestamp(date).timestamp())
+
+
+class SqlTransactionsStore:
+    """
+    Enriched transactions stored in a sqlite database, queried with filters
+    and aggregations pushed down, so that only results are loaded to memory.
+
+    Transaction dates are stored as seconds since epoch and indexed, alone
+    and along with category, type and year-month.
+    """
+
+    def __init__(self, *, file_path: str) -> None:
+        self.file_path = file_path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.file_path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        return connection
+
+    def _get_metadata(self, key: str) -> str | None:
+        try:
+            with closing(self._connect()) as connection:
+                row = connection.execute(
+                    "SELECT value FROM metadata WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            log.info(f"Couldn't read transactions store {self.file_path}: {e}")
+            return None
+        return row[0] if row else None
+
+    @property
+    def version(self) -> str | None:
+        return self._get_metadata("version")
+
+    @property
+    def categories(self) -> list[str]:
+        return json.loads(self._get_metadata("categories") or "[]")
+
+    @property
+    def dtypes(self) -> dict[str, str]:
+        """Dtypes of the dataset columns, restored on the queried transactions."""
+        return json.loads(self._get_metadata("dtypes") or "{}")
+
+    def write(self, dataset: Dataset) -> None:
+        """Replaces the stored transactions with the dataset."""
+        self.write_chunks([dataset.df], dataset.version, dataset.categories)
+
+    def write_chunks(
+        self, dfs: Iterable[pd.DataFrame], version: str, categories: Iterable[str]
+    ) -> None:
+        """
+        Replaces the stored transactions with the chunks, appended one by one
+        to a new table, which replaces the old one after the last chunk.
+        Without any chunk, the table is empty.
+        """
+        n_transactions, dtypes = 0, {}
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DROP TABLE IF EXISTS transactions_new")
+            connection.execute(
+                "CREATE TABLE transactions_new ("
+                + ", ".join(
+                    f"{column} {_COLUMN_SQL_TYPES.get(column, 'TEXT')}"
+                    for column in _TABLE_COLUMNS
+                )
+                + ")"
+            )
+            for df in dfs:
+                # dtypes of columns with values win over all null ones
+                dtypes |= {
+                    column: str(df[column].dtype)
+                    for column in df.columns
+                    if column in _TABLE_COLUMNS
+                    and (column not in dtypes or df[column].notna().any())
+                }
+                df = df.reindex(columns=_TABLE_COLUMNS).assign(
+                    **{
+                        TransactionColumn.TRANSACTION_DATE: df[
+                            TransactionColumn.TRANSACTION_DATE
+                        ]
+                        .to_numpy(dtype="datetime64[s]")
+                        .astype("int64")
+                    }
+                )
+                df.to_sql(
+                    "transactions_new",
+                    connection,
+                    index=False,
+                    if_exists="append",
+                    chunksize=10_000,
+                )
+                n_transactions += len(df)
+
+            connection.execute("DROP TABLE IF EXISTS transactions")
+            connection.execute("ALTER TABLE transactions_new RENAME TO transactions")
+            connection.execute(
+                "CREATE INDEX transactions_date "
+                f"ON transactions ({TransactionColumn.TRANSACTION_DATE})"
+            )
+            for column in _INDEXED_COLUMNS:
+                connection.execute(
+                    f"CREATE INDEX transactions_{column} "
+                    f"ON transactions ({column}, {TransactionColumn.TRANSACTION_DATE})"
+                )
+            connection.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                [
+                    ("version", version),
+                    ("categories", json.dumps(list(categories))),
+                    ("dtypes", json.dumps(dtypes)),
+                ],
+            )
+        log.info(f"Saved {n_transactions} transactions to {self.file_path}")
+
+    def _query(self, sql: str, params: list) -> pd.DataFrame:
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def _columns(self) -> set[str]:
+        with closing(self._connect()) as connection:
+            return {
+                row[1] for row in connection.execute("PRAGMA table_info(transactions)")
+            }
+
+    @staticmethod
+    def _where(
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+        categories: list[str] | None = None,
+        types: list[str] | None = None,
+    ) -> tuple[str, list]:
+        conditions, params = ["1 = 1"], []
+        if start_datetime:
+            conditions.append(f"{TransactionColumn.TRANSACTION_DATE} >= ?")
+            params.append(_to_seconds(start_datetime))
+        if end_datetime:
+            conditions.append(f"{TransactionColumn.TRANSACTION_DATE} <= ?")
+            params.append(_to_seconds(end_datetime))
+        for column, values in [
+            (TransactionColumn.CATEGORY, categories),
+            (TransactionColumn.TYPE, types),
+        ]:
+            if values is not None:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return " AND ".join(conditions), params
+
+    def filter_transactions(
+        self,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+        categories: list[str] | None = None,
+        types: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Transactions within the dates, of the categories and types (if given)."""
+        where, params = self._where(start_datetime, end_datetime, categories, types)
+        df = self._query(
+            f"SELECT * FROM transactions WHERE {where} "
+            f"ORDER BY {TransactionColumn.TRANSACTION_DATE}, rowid",
+            params,
+        )
+        dtypes = self.dtypes
+        # only columns of the saved transactions, all of them if there were none
+        df = df[list(dtypes) or list(df.columns)]
+        df[TransactionColumn.TRANSACTION_DATE] = pd.to_datetime(
+            df[TransactionColumn.TRANSACTION_DATE], unit="s"
+        )
+        log.info(f"{len(df)} transactions queried from {self.file_path}")
+        return df.astype(dtypes)
+
+    def get_monthly_rollup(self) -> MonthlyRollup:
+        """Same rollup as `get_monthly_rollup`, aggregated by the database."""
+        dimensions = ", ".join(ROLLUP_DIMENSIONS)
+        date = TransactionColumn.TRANSACTION_DATE
+        df = self._query(
+            f"SELECT {dimensions}, "
+            f"SUM({TransactionColumn.AMOUNT_ABS}) AS {TransactionColumn.AMOUNT_ABS}, "
+            f"COUNT(*) AS {TransactionColumn.N_TRANSACTIONS}, "
+            f"MIN({date}) AS {TransactionColumn.MIN_DATE}, "
+            f"MAX({date}) AS {TransactionColumn.MAX_DATE} "
+            f"FROM transactions GROUP BY {dimensions}",
+            [],
+        )
+        for column in [TransactionColumn.MIN_DATE, TransactionColumn.MAX_DATE]:
+            df[column] = pd.to_datetime(df[column], unit="s")
+        return MonthlyRollup(
+            df.set_index(
+                [TransactionColumn.YEAR_MONTH, TransactionColumn.TYPE]
+            ).sort_index()
+        )
+
+    def get_range_totals_df(
+        self,
+        group_by_col: str,
+        categories: list[str],
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> pd.DataFrame:
+        """Same totals as `get_transactions_totals_df`, aggregated by the database."""
+        if group_by_col not in self._columns():
+            raise ValueError(f"Unknown column {group_by_col}")
+        where, params = self._where(start_datetime, end_datetime, categories)
+        df = self._query(
+            f"SELECT {group_by_col}, "
+            + ", ".join(
+                f"SUM(CASE WHEN {TransactionColumn.TYPE} = '{t}' "
+                f"THEN {TransactionColumn.AMOUNT_ABS} ELSE 0 END) AS {t}"
+                for t in (TransactionType.INCOME, TransactionType.OUTCOME)
+            )
+            + f", COUNT(*) AS {TransactionColumn.N_TRANSACTIONS} "
+            f"FROM transactions WHERE {where} AND {group_by_col} IS NOT NULL "
+            f"GROUP BY {group_by_col} ORDER BY {group_by_col}",
+            params,
+        ).set_index(group_by_col)
+        df.insert(
+            2,
+            TransactionColumn.DELTA,
+            df[TransactionType.INCOME] - df[TransactionType.OUTCOME],
+        )
+        return df
+
+    def get_file_path_aggregated_df(self) -> pd.DataFrame:
+        """Same table as `get_file_path_aggregated_df`, aggregated by the database."""
+        date = TransactionColumn.TRANSACTION_DATE_ISOSTR
+        df = self._query(
+            f"SELECT {TransactionColumn.SOURCE_FILE_PATH}, "
+            f"GROUP_CONCAT(DISTINCT {TransactionColumn.SOURCE_TYPE}) "
+            f"AS {TransactionColumn.SOURCE_TYPE}, "
+            f"COUNT(*) AS {TransactionColumn.N_TRANSACTIONS}, "
+            f"MIN({date}) AS {TransactionColumn.MIN_DATE}, "
+            f"MAX({date}) AS {TransactionColumn.MAX_DATE} "
+            f"FROM transactions GROUP BY {TransactionColumn.SOURCE_FILE_PATH}",
+            [],
+        )
+        df[TransactionColumn.SOURCE_TYPE] = df[TransactionColumn.SOURCE_TYPE].map(
+            lambda source_types: set(source_types.split(","))
+        )
+        return df.set_index(TransactionColumn.SOURCE_FILE_PATH).sort_values(
+            TransactionColumn.MAX_DATE, ascending=False
+        )
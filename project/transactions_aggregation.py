@@ -1,7 +1,6 @@
 from dataclasses import dataclass
 
 import pandas as pd
-import numpy as np
 
 from project.enums import TransactionColumn, TransactionType
 
@@ -24,59 +23,59 @@ FREQUENCIES = [
 ]
 
 
-def get_time_aggregated_transactions_df(
+def get_time_aggregated_income_expense_delta_dfs(
     input_df: pd.DataFrame,
     frequency: FrequencyConfig,
-) -> pd.DataFrame:
-
-    groupers = []
-    groupers.append(pd.Grouper(key="group_value"))
-    groupers.append(
-        pd.Grouper(
-            key=TransactionColumn.TRANSACTION_DATE,
-            freq=frequency.tag,
-            label=frequency.label,
-        )
-    )
-
-    # group by time and aggregate
-    out_df = (
-        input_df.groupby(groupers, group_keys=True)[TransactionColumn.AMOUNT_ABS]
-        .apply(np.sum)
-        .reset_index()
-        .pivot(
-            index=TransactionColumn.TRANSACTION_DATE,
-            columns="group_value",
-            values=TransactionColumn.AMOUNT_ABS,
-        )
-        .fillna(0.0)
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Amounts of income and of expense transactions per group value (columns)
+    and period (rows), and income, outcome and delta totals per period,
+    computed with a single grouped sum. All three share the same periods.
+    """
+    totals = input_df.groupby(
+        [
+            # plain keys, pd.Grouper loses the names of categorical columns
+            TransactionColumn.TYPE,
+            TransactionColumn.GROUP_VALUE,
+            pd.Grouper(
+                key=TransactionColumn.TRANSACTION_DATE,
+                freq=frequency.tag,
+                label=frequency.label,
+            ),
+        ],
+        observed=True,
+    )[TransactionColumn.AMOUNT_ABS].sum()
+    table_df = totals.unstack(
+        [TransactionColumn.TYPE, TransactionColumn.GROUP_VALUE], fill_value=0.0
+    ).sort_index(axis=1)
+    labels = pd.DatetimeIndex(table_df.index).strftime(frequency.value_format)
+
+    type_dfs = {}
+    for transaction_type in (TransactionType.INCOME, TransactionType.OUTCOME):
+        if transaction_type in table_df.columns.get_level_values(0):
+            type_df = table_df[transaction_type].copy()
+        else:
+            type_df = pd.DataFrame(index=table_df.index, dtype=float)
+        type_df.index = pd.Index(labels, name=TransactionColumn.TRANSACTION_DATE)
+        type_df.columns.name = TransactionColumn.GROUP_VALUE
+        type_dfs[transaction_type] = type_df
+
+    delta_df = pd.DataFrame(
+        {t: type_df.sum(axis=1) for t, type_df in type_dfs.items()},
     )
-
-    out_df.index = out_df.index.map(lambda x: x.strftime(frequency.value_format))
-
-    return out_df
-
-
-def get_time_aggregated_summarized_delta_df(
-    income_df: pd.DataFrame, expense_df: pd.DataFrame
-) -> pd.DataFrame:
-    df = pd.DataFrame(
-        {
-            TransactionType.INCOME: income_df.apply(sum, axis=1),
-            TransactionType.OUTCOME: expense_df.apply(sum, axis=1),
-        }
-    ).fillna(0.0)
-    df[TransactionColumn.DELTA] = (
-        df[TransactionType.INCOME] - df[TransactionType.OUTCOME]
+    delta_df[TransactionColumn.DELTA] = (
+        delta_df[TransactionType.INCOME] - delta_df[TransactionType.OUTCOME]
     )
-    return df
+    return type_dfs[TransactionType.INCOME], type_dfs[TransactionType.OUTCOME], delta_df
 
 
 def get_significant_group_values(
     transactions_df: pd.DataFrame, group_by_col: str, n_biggest_groups: int
 ) -> set:
     biggest_groups_names = (
-        transactions_df.groupby(group_by_col)[TransactionColumn.AMOUNT_ABS]
+        transactions_df.groupby(group_by_col, observed=True)[
+            TransactionColumn.AMOUNT_ABS
+        ]
         .sum()
         .sort_values(ascending=False)[:n_biggest_groups]
     )
@@ -85,7 +84,7 @@ def get_significant_group_values(
 
 def get_file_path_aggregated_df(transactions_df: pd.DataFrame) -> pd.DataFrame:
     return (
-        transactions_df.groupby(TransactionColumn.SOURCE_FILE_PATH)
+        transactions_df.groupby(TransactionColumn.SOURCE_FILE_PATH, observed=True)
         .apply(
             lambda _df: pd.Series(
                 {
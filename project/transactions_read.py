@@ -1,24 +1,30 @@
 from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
+import multiprocessing
 from datetime import timedelta
 import os
 from types import SimpleNamespace
+from typing import Iterable, Iterator
 import numpy as np
 import pandas as pd
 import unicodedata
-import codecs
-from io import StringIO
+from io import BytesIO
 from enum import Enum
 import logging
-import re
 from project.categories import CategoriesCache, CategoriesRules, CategoryRule
-from project.constants import UNRECOGNIZED
+from project.categorization import CategorizationEngine
+from project.constants import PARSING_MAX_WORKERS
 from project.enums import TransactionColumn, TransactionType
-from project.utils import hash_string, list_files
-import streamlit as st
+from project.utils import hash_rows, list_files
+from project.caching import memoize
 
 log = logging.getLogger(__name__)
 
+# below that, starting worker processes costs more than it saves
+MIN_FILES_FOR_PARALLEL_PARSING = 4
+
 
 @dataclass
 class CsvCol:
@@ -65,13 +71,70 @@ mandatory_out_fields = {
 }
 
 
+def _get_cp1250_to_ascii_translation() -> tuple[bytes, bytes]:
+    """
+    `bytes.translate` arguments turning cp1250 encoded text to ascii, the same
+    way as decoding it, NFD normalization and dropping non ascii characters
+    (e.g. "ż" -> "z", "ł" -> "").
+    """
+    table = bytearray(range(256))
+    delete = bytearray()
+    for byte in range(128, 256):
+        try:
+            char = bytes([byte]).decode("cp1250")
+        except UnicodeDecodeError:
+            delete.append(byte)
+            continue
+        ascii_char = unicodedata.normalize("NFD", char).encode("ascii", "ignore")
+        if ascii_char:
+            table[byte] = ascii_char[0]
+        else:
+            delete.append(byte)
+    return bytes(table), bytes(delete)
+
+
+CP1250_TO_ASCII_TABLE, CP1250_TO_ASCII_DELETE = _get_cp1250_to_ascii_translation()
+
+
 class Parser:
+    # bump when parsing output changes, invalidates parsed files cache
+    version: int = 1
+
+    @staticmethod
+    def normalize_line(line: bytes) -> bytes:
+        if line.isascii():
+            return line
+        return line.translate(CP1250_TO_ASCII_TABLE, CP1250_TO_ASCII_DELETE)
+
+    @staticmethod
+    def is_header_line(line: bytes) -> bool:
+        raise NotImplementedError()
+
     @staticmethod
-    def normalize_lines(lines):
-        return [
-            unicodedata.normalize("NFD", line).encode("ascii", "ignore")
-            for line in lines
-        ]
+    def is_footer_line(line: bytes) -> bool:
+        raise NotImplementedError()
+
+    def read_data_lines(self, file_path: str) -> BytesIO:
+        """
+        Normalized lines between the header and footer lines of a cp1250
+        encoded export, read in a single pass.
+        """
+        data = BytesIO()
+        with open(file_path, "rb") as f:
+            for line in f:
+                if self.is_header_line(self.normalize_line(line)):
+                    break
+            else:
+                raise ValueError(f"Header line not found in {file_path}")
+
+            for line in f:
+                line = self.normalize_line(line)
+                if self.is_footer_line(line):
+                    break
+                data.write(line)
+
+        data.seek(0)
+        return data
 
     @staticmethod
     def validate_raw(df) -> str:
@@ -97,8 +160,7 @@ class Parser:
         )
         return df
 
-    def parse_and_validate(self, file_path: str) -> pd.DataFrame:
-        df = self.parse_raw(file_path)
+    def clean_and_validate(self, df: pd.DataFrame) -> pd.DataFrame:
         df = self.clean_raw(df)
         err = self.validate_raw(df)
 
@@ -110,39 +172,32 @@ class Parser:
 
         return df
 
+    def parse_and_validate(self, file_path: str) -> pd.DataFrame:
+        return self.clean_and_validate(self.parse_raw(file_path))
 
-class IngParser(Parser):
-    @staticmethod
-    def truncate_header(lines: list[bytes]):
-        for i_line, line in enumerate(lines):
-            if line.startswith(b'''"Data transakcji"'''):
-                i_header_line = i_line
-                break
+    def parse_and_validate_chunks(
+        self, file_path: str, chunk_size: int
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Parsed file in dataframes of at most `chunk_size` rows. Parsers not
+        reading in chunks return the whole file at once.
+        """
+        yield self.parse_and_validate(file_path)
 
-        return lines[i_header_line + 1 :]
 
+class IngParser(Parser):
     @staticmethod
-    def truncate_footer(lines: list[bytes]):
-        i_footer_line = len(lines)
-        for i_line, line in enumerate(lines):
-            if line.startswith(b""""Dokument ma charakter informacyjny"""):
-                i_footer_line = i_line
-                break
+    def is_header_line(line: bytes) -> bool:
+        return line.startswith(b'''"Data transakcji"''')
 
-        return lines[:i_footer_line]
+    @staticmethod
+    def is_footer_line(line: bytes) -> bool:
+        return line.startswith(b""""Dokument ma charakter informacyjny""")
 
     def parse_raw(self, file_path) -> pd.DataFrame:
-        with codecs.open(file_path, "rb", "cp1250") as f:
-            lines = f.readlines()
-            lines_n = self.normalize_lines(lines)
-            lines_nth = self.truncate_header(lines_n)
-            lines_ntf = self.truncate_footer(lines_nth)
-
-        string_io = StringIO(b"".join(lines_ntf).decode("utf-8"))
-
         # read as dataframe
         df = pd.read_csv(
-            string_io,
+            self.read_data_lines(file_path),
             header=None,
             sep=";",
             usecols=[ic.index for ic in input_cols_ing],
@@ -153,45 +208,31 @@ class IngParser(Parser):
 
 
 class MbankParser(Parser):
-    @staticmethod
-    def truncate_header(lines: list[bytes]) -> list[bytes]:
-        for i_line, line in enumerate(lines):
-            if line.startswith(b"#Data ksiegowania"):
-                i_header_line = i_line
-                break
-
-        return lines[i_header_line + 1 :]
+    # 64-bit integer transaction ids instead of sha256 hex digests, changes ids
+    # of all mbank transactions (and drops their cached categories), bump
+    # `version` when switching
+    compact_transaction_ids: bool = False
 
     @staticmethod
-    def truncate_footer(lines: list[bytes]) -> list[bytes]:
-        i_footer_line = len(lines)
-        for i_line, line in enumerate(lines):
-            if b"#Saldo" in line:
-                i_footer_line = i_line
-                break
+    def is_header_line(line: bytes) -> bool:
+        return line.startswith(b"#Data ksiegowania")
 
-        return lines[:i_footer_line]
+    @staticmethod
+    def is_footer_line(line: bytes) -> bool:
+        return b"#Saldo" in line
 
     def parse_raw(self, file_path: str) -> pd.DataFrame:
-        with codecs.open(file_path, "rb", "cp1250") as f:
-            lines = f.readlines()
-            lines_n = self.normalize_lines(lines)
-            lines_nt = self.truncate_header(lines_n)
-            lines_ntf = self.truncate_footer(lines_nt)
-
-        string_io = StringIO(b"".join(lines_ntf).decode("utf-8"))
-
         # read as dataframe
         df = pd.read_csv(
-            string_io,
+            self.read_data_lines(file_path),
             sep=";",
             header=None,
             usecols=[ic.index for ic in input_cols_mbank],
             names=[ic.name for ic in input_cols_mbank],
         )
 
-        df[TransactionColumn.TRANSACTION_ID] = df.apply(
-            lambda r: hash_string("".join([str(v) for v in r])), axis=1
+        df[TransactionColumn.TRANSACTION_ID] = hash_rows(
+            df, compact=self.compact_transaction_ids
         )
         df[TransactionColumn.ACCOUNT_NAME] = "mbank"
 
@@ -199,14 +240,37 @@ class MbankParser(Parser):
 
 
 class GenericParser(Parser):
+    version: int = 2
+    # text columns read as strings, so that all chunks of a file get the same
+    # dtypes, whatever values they happen to contain
+    dtypes: dict[str, type] = {
+        field: str
+        for field in mandatory_out_fields
+        if field != TransactionColumn.TRANSACTION_DATE
+    }
+
     def parse_raw(self, file_path: str) -> pd.DataFrame:
         df = pd.read_csv(
             file_path,
             sep=',',
             usecols=mandatory_out_fields,
+            dtype=self.dtypes,
         )
         return df
 
+    def parse_and_validate_chunks(
+        self, file_path: str, chunk_size: int
+    ) -> Iterator[pd.DataFrame]:
+        with pd.read_csv(
+            file_path,
+            sep=',',
+            usecols=mandatory_out_fields,
+            dtype=self.dtypes,
+            chunksize=chunk_size,
+        ) as reader:
+            for df in reader:
+                yield self.clean_and_validate(df)
+
 
 PARSER_BY_SOURCE_TYPE: dict[str, type] = {
     SourceType.ing.name: IngParser,
@@ -215,17 +279,54 @@ PARSER_BY_SOURCE_TYPE: dict[str, type] = {
 }
 
 
-@st.cache_data
-def parse_csv_files_as_df(csv_files: list[CsvFile]) -> pd.DataFrame:
+def parse_csv_file(csv_file: CsvFile) -> pd.DataFrame:
+    log.info(f"Parsing {csv_file}")
+    parser = PARSER_BY_SOURCE_TYPE[csv_file.source_type.name]()
+    df = parser.parse_and_validate(csv_file.path)
+    log.info(f"{len(df)} transaction read from {csv_file.path}")
+    return df
+
+
+def parse_csv_file_chunks(csv_file: CsvFile, chunk_size: int) -> Iterator[pd.DataFrame]:
+    log.info(f"Parsing {csv_file} in chunks of {chunk_size} rows")
+    parser = PARSER_BY_SOURCE_TYPE[csv_file.source_type.name]()
+    yield from parser.parse_and_validate_chunks(csv_file.path, chunk_size)
+
+
+def add_source_columns(df: pd.DataFrame, csv_file: CsvFile) -> pd.DataFrame:
+    df[TransactionColumn.SOURCE_FILE_PATH] = csv_file.relative_path
+    df[TransactionColumn.SOURCE_TYPE] = str(csv_file.source_type.name)
+    return df
+
+
+def parse_csv_files(
+    csv_files: list[CsvFile], max_workers: int = PARSING_MAX_WORKERS
+) -> list[pd.DataFrame]:
+    """
+    Parses files in a pool of `max_workers` processes, dataframes are returned
+    in the order of `csv_files`. `max_workers` of 1 parses serially.
+    """
+    if max_workers <= 1 or len(csv_files) < MIN_FILES_FOR_PARALLEL_PARSING:
+        return [parse_csv_file(csv_file) for csv_file in csv_files]
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(csv_files)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            return list(executor.map(parse_csv_file, csv_files))
+    except (BrokenProcessPool, OSError) as e:
+        log.warning(f"Parallel parsing failed ({e}), parsing serially")
+        return [parse_csv_file(csv_file) for csv_file in csv_files]
+
+
+@memoize()
+def parse_csv_files_as_df(
+    csv_files: list[CsvFile], max_workers: int = PARSING_MAX_WORKERS
+) -> pd.DataFrame:
     dfs = []
-    for csv_file in csv_files:
-        log.info(f"Parsing {csv_file}")
-        parser = PARSER_BY_SOURCE_TYPE[csv_file.source_type.name]()
-        df = parser.parse_and_validate(csv_file.path)
-        df[TransactionColumn.SOURCE_FILE_PATH] = csv_file.relative_path
-        df[TransactionColumn.SOURCE_TYPE] = str(csv_file.source_type.name)
-        log.info(f"{len(df)} transaction read from {csv_file.path}")
-        dfs.append(df)
+    for csv_file, df in zip(csv_files, parse_csv_files(csv_files, max_workers)):
+        dfs.append(add_source_columns(df, csv_file))
 
     df = pd.concat(dfs, ignore_index=True)
     return df
@@ -283,61 +384,177 @@ def get_category(
     return None
 
 
-def add_columns(
+def format_dates(dates: pd.Series, date_format: str) -> pd.Series:
+    """`dates.dt.strftime`, but formatting each day only once."""
+    codes, uniques = pd.factorize(dates.dt.normalize(), use_na_sentinel=False)
+    return pd.Series(
+        uniques.strftime(date_format).to_numpy(dtype=object)[codes], index=dates.index
+    )
+
+
+def parse_amounts(amounts: pd.Series) -> pd.Series:
+    """Amounts as floats, e.g. "-1 234,56 PLN" -> -1234.56"""
+    if pd.api.types.is_numeric_dtype(amounts):
+        return amounts.astype(float)
+    # exports repeat the same amounts a lot, each is parsed only once
+    codes, uniques = pd.factorize(amounts, use_na_sentinel=False)
+    parsed_uniques = (
+        pd.Series(uniques, dtype=object)
+        .astype(str)
+        .str.replace("(PLN)", "", regex=True)
+        .str.replace(" ", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .astype(float)
+    )
+    return pd.Series(parsed_uniques.to_numpy()[codes], index=amounts.index)
+
+
+# text columns with few distinct values, each value is stored only once
+CATEGORICAL_COLUMNS = [
+    TransactionColumn.CATEGORY,
+    TransactionColumn.CONTRACTOR,
+    TransactionColumn.ACCOUNT_NAME,
+    TransactionColumn.SOURCE_TYPE,
+    TransactionColumn.SOURCE_FILE_PATH,
+    TransactionColumn.TYPE,
+    TransactionColumn.ONE_GROUP,
+    TransactionColumn.TRANSACTION_DATE_ISOSTR,
+    TransactionColumn.TRANSACTION_DATE_ISOSTR_MONTH,
+    TransactionColumn.TRANSACTION_DATE_ISOSTR_YEAR,
+]
+
+
+def compact_transactions_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Enriched transactions with categorical text columns, integer year-month
+    and nullable integer category rule ids.
+    """
+    return df.astype(
+        {column: "category" for column in CATEGORICAL_COLUMNS if column in df}
+        | {
+            TransactionColumn.YEAR_MONTH: "int32",
+            TransactionColumn.CATEGORY_RULE_ID: "Int64",
+        }
+    )
+
+
+def _get_categorization_engines(
+    categories_rules: CategoriesRules, first_changed_rule_id: float
+) -> tuple[CategorizationEngine, CategorizationEngine]:
+    # for transactions not cached and for the ones cached with outdated rules
+    return CategorizationEngine(categories_rules), CategorizationEngine(
+        categories_rules.starting_from(first_changed_rule_id)
+    )
+
+
+def _add_columns(
     df: pd.DataFrame,
-    categories_rules: CategoriesRules,
     categories_cache: CategoriesCache,
+    engines: tuple[CategorizationEngine, CategorizationEngine],
+    first_changed_rule_id: float,
 ) -> pd.DataFrame:
     df = df.copy()
-    df[TransactionColumn.TRANSACTION_DATE] = df[TransactionColumn.TRANSACTION_DATE].map(
-        lambda d: pd.to_datetime(d)
+    df[TransactionColumn.TRANSACTION_DATE] = pd.to_datetime(
+        df[TransactionColumn.TRANSACTION_DATE]
+    )
+    transaction_date = df[TransactionColumn.TRANSACTION_DATE]
+    df[TransactionColumn.TRANSACTION_DATE_ISOSTR] = format_dates(
+        transaction_date, "%Y-%m-%d"
     )
-    df[TransactionColumn.TRANSACTION_DATE_ISOSTR] = df[
-        TransactionColumn.TRANSACTION_DATE
-    ].map(lambda d: d.strftime("%Y-%m-%d"))
-    df[TransactionColumn.TRANSACTION_DATE_ISOSTR_MONTH] = df[
-        TransactionColumn.TRANSACTION_DATE
-    ].map(lambda d: d.strftime("%Y-%m"))
-    df[TransactionColumn.TRANSACTION_DATE_ISOSTR_YEAR] = df[
-        TransactionColumn.TRANSACTION_DATE
-    ].map(lambda d: d.strftime("%Y"))
-
-    df[TransactionColumn.AMOUNT] = df[TransactionColumn.AMOUNT].map(
-        lambda x: float(re.sub("(PLN)", "", str(x)).replace(" ", "").replace(",", "."))
+    df[TransactionColumn.TRANSACTION_DATE_ISOSTR_MONTH] = format_dates(
+        transaction_date, "%Y-%m"
     )
-    df[TransactionColumn.TYPE] = df[TransactionColumn.AMOUNT].map(
-        lambda x: TransactionType.INCOME if x >= 0 else TransactionType.OUTCOME
+    df[TransactionColumn.TRANSACTION_DATE_ISOSTR_YEAR] = format_dates(
+        transaction_date, "%Y"
     )
-    df[TransactionColumn.AMOUNT_ABS] = df[TransactionColumn.AMOUNT].map(
-        lambda x: abs(x)
+    df[TransactionColumn.YEAR_MONTH] = (
+        transaction_date.dt.year * 100 + transaction_date.dt.month
     )
+
+    df[TransactionColumn.AMOUNT] = parse_amounts(df[TransactionColumn.AMOUNT])
+    df[TransactionColumn.TYPE] = np.where(
+        df[TransactionColumn.AMOUNT] >= 0,
+        TransactionType.INCOME.value,
+        TransactionType.OUTCOME.value,
+    )
+    df[TransactionColumn.AMOUNT_ABS] = df[TransactionColumn.AMOUNT].abs()
     df[TransactionColumn.ONE_GROUP] = "all"
 
     log.info("Setting categories")
 
-    def process_row(row):
-        category, category_rule_id = categories_cache.get(
-            row[TransactionColumn.TRANSACTION_ID], (UNRECOGNIZED, np.NaN)
+    category_and_rule_id = categories_cache.get_categories(
+        df[TransactionColumn.TRANSACTION_ID]
+    )
+    engine, outdated_engine = engines
+    is_cached = category_and_rule_id[TransactionColumn.CATEGORY].notna()
+    if (~is_cached).any():
+        category_and_rule_id.loc[~is_cached] = engine.categorize(df[~is_cached])
+
+    # cached rows assigned by a rule changed since, or by none, are categorized
+    # again, but only with the rules that changed and the ones after them
+    # (none when no rule changed, even for unrecognized rows)
+    is_outdated = (
+        is_cached
+        & ~(
+            category_and_rule_id[TransactionColumn.CATEGORY_RULE_ID]
+            < first_changed_rule_id
+        )
+        & (first_changed_rule_id != float("inf"))
+    )
+    if is_outdated.any():
+        category_and_rule_id.loc[is_outdated] = outdated_engine.categorize(
+            df[is_outdated]
         )
 
-        if np.isnan(category_rule_id):
-            category_rule = get_category(row, categories_rules.items)
-
-            if category_rule:
-                category, category_rule_id = (
-                    category_rule.category,
-                    category_rule.rule_id,
-                )
-            else:
-                category, category_rule_id = UNRECOGNIZED, None
-        return category, category_rule_id
+    df[TransactionColumn.CATEGORY] = category_and_rule_id[TransactionColumn.CATEGORY]
+    df[TransactionColumn.CATEGORY_RULE_ID] = category_and_rule_id[
+        TransactionColumn.CATEGORY_RULE_ID
+    ]
+    return df
 
-    category_and_rule_id = df.apply(process_row, axis=1)
 
-    df[TransactionColumn.CATEGORY] = category_and_rule_id.map(lambda r: r[0])
-    df[TransactionColumn.CATEGORY_RULE_ID] = category_and_rule_id.map(lambda r: r[1])
+def add_columns(
+    df: pd.DataFrame,
+    categories_rules: CategoriesRules,
+    categories_cache: CategoriesCache,
+) -> pd.DataFrame:
+    first_changed_rule_id = categories_cache.first_changed_rule_id(categories_rules)
+    df = _add_columns(
+        df,
+        categories_cache,
+        _get_categorization_engines(categories_rules, first_changed_rule_id),
+        first_changed_rule_id,
+    )
 
     log.info("Saving cache")
-    categories_cache.write(df)
+    categories_cache.write(df, categories_rules)
+    categories_cache.keep(df[TransactionColumn.TRANSACTION_ID])
+    categories_cache.prune()
 
-    return df
+    # sorted, so that partitions and their row groups are ordered by date
+    return compact_transactions_df(df).sort_values(
+        TransactionColumn.TRANSACTION_DATE, kind="stable", ignore_index=True
+    )
+
+
+def add_columns_in_chunks(
+    dfs: Iterable[pd.DataFrame],
+    categories_rules: CategoriesRules,
+    categories_cache: CategoriesCache,
+) -> Iterator[pd.DataFrame]:
+    """
+    `add_columns` of every chunk of transactions, not sorted. The rules are
+    saved to the categories cache after the last chunk only, so that all
+    chunks are checked against the rules the cache was written with, and
+    transactions of none of the chunks are pruned from it then.
+    """
+    first_changed_rule_id = categories_cache.first_changed_rule_id(categories_rules)
+    # compiled once for all chunks
+    engines = _get_categorization_engines(categories_rules, first_changed_rule_id)
+    for df in dfs:
+        df = _add_columns(df, categories_cache, engines, first_changed_rule_id)
+        categories_cache.write(df, categories_rules, save_rules=False)
+        categories_cache.keep(df[TransactionColumn.TRANSACTION_ID])
+        yield compact_transactions_df(df)
+    categories_cache.prune()
+    categories_cache.write_rules(categories_rules)
@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+from project.caching import memoize
+from project.dataset import DATASET_HASH_FUNCS, Dataset
+from project.enums import TransactionColumn
+
+ROLLUP_DIMENSIONS = [
+    TransactionColumn.YEAR_MONTH,
+    TransactionColumn.TYPE,
+    TransactionColumn.CATEGORY,
+    TransactionColumn.ACCOUNT_NAME,
+]
+
+
+@dataclass
+class MonthlyRollup:
+    """
+    Transactions totals per year-month, type, category and account, from which
+    monthly metrics are answered without touching the transactions.
+    """
+
+    df: pd.DataFrame  # indexed by (year_month, type), sorted
+
+    def exclude_categories(self, categories: list[str]) -> "MonthlyRollup":
+        return MonthlyRollup(
+            self.df[~self.df[TransactionColumn.CATEGORY].isin(categories)]
+        )
+
+
+@memoize(hash_funcs=DATASET_HASH_FUNCS)
+def get_monthly_rollup(dataset: Dataset) -> MonthlyRollup:
+    rollup_df = (
+        dataset.df.groupby(ROLLUP_DIMENSIONS, observed=True, dropna=False)
+        .agg(
+            **{
+                TransactionColumn.AMOUNT_ABS: (TransactionColumn.AMOUNT_ABS, "sum"),
+                TransactionColumn.N_TRANSACTIONS: (
+                    TransactionColumn.AMOUNT_ABS,
+                    "size",
+                ),
+                TransactionColumn.MIN_DATE: (TransactionColumn.TRANSACTION_DATE, "min"),
+                TransactionColumn.MAX_DATE: (TransactionColumn.TRANSACTION_DATE, "max"),
+            }
+        )
+        .reset_index()
+        .set_index([TransactionColumn.YEAR_MONTH, TransactionColumn.TYPE])
+        .sort_index()
+    )
+    return MonthlyRollup(rollup_df)
@@ -1,41 +1,33 @@
 import pandas as pd
 
 from project.transactions_aggregation import get_significant_group_values
-from project.transactions_filters import filter_transactions_date_range
 from project.utils import get_emoji
 from project.enums import TransactionColumn
-import streamlit as st
 
 
-@st.cache_data
-def get_state_transactions_df(
-    all_transactions_df: pd.DataFrame,
-    categories: list[str],
-    start_date,
-    end_date,
+def prepare_state_transactions_df(
+    state_transactions_df: pd.DataFrame,
     group_by_col: str,
     n_biggest_groups: int,
     order_by_command: str | None = None,
 ) -> pd.DataFrame:
-
-    # filter by date range
-    state_transactions_df = filter_transactions_date_range(
-        all_transactions_df, start_date, end_date
-    )
-    # filter by category
-    state_transactions_df = state_transactions_df[
-        state_transactions_df[TransactionColumn.CATEGORY].isin(categories)
-    ]
-
+    """
+    Already filtered transactions with group and display columns, added to a
+    new dataframe (the given one can be shared by a cache).
+    """
     # set group_value column for N biggest groups
     biggest_groups_values = get_significant_group_values(
         transactions_df=state_transactions_df,
         group_by_col=group_by_col,
         n_biggest_groups=n_biggest_groups,
     )
-    state_transactions_df[TransactionColumn.GROUP_VALUE] = state_transactions_df[
-        group_by_col
-    ].map(lambda group: group if group in biggest_groups_values else "other")
+    state_transactions_df = state_transactions_df.assign(
+        **{
+            TransactionColumn.GROUP_VALUE: state_transactions_df[group_by_col].map(
+                lambda group: group if group in biggest_groups_values else "other"
+            )
+        }
+    )
 
     if order_by_command:
         order_by_col = order_by_command.split(':')[0]
@@ -1,72 +1,174 @@
+from dataclasses import dataclass, field
+
+import numpy as np
 import pandas as pd
 import streamlit_antd_components as sac
 
 from project.enums import TransactionColumn, TransactionType
 
 
-def _prepare_items_tree(transactions_df: pd.DataFrame, nesting_cols: list[str]):
-    items_lookup = {}
-    items = []
+@dataclass(frozen=True)
+class TreeNode:
+    kind: str  # 'group', 'transaction' or 'more'
+    path: tuple  # of the group the node belongs to
 
-    for group_labels, _ in transactions_df.groupby(nesting_cols):
-        for i_level, group_label in enumerate(group_labels):
-            path = tuple(group_labels[: i_level + 1])
-            if path not in items_lookup:
-                item = sac.TreeItem(group_label)
-                if i_level == 0:
-                    item.children = []
-                    items.append(item)
-                    items_lookup[path] = item
-                else:
-                    parent_path = tuple(group_labels[:i_level])
-                    items_lookup[parent_path].children.append(item)
-                    items_lookup[path] = item
 
-    return items, items_lookup
+@dataclass
+class TreeExpansion:
+    """Groups expanded by the user and number of leaves shown in each of them."""
 
+    nesting_cols: list[str] = field(default_factory=list)
+    expanded_paths: set[tuple] = field(default_factory=set)
+    leaves_limits: dict[tuple, int] = field(default_factory=dict)
+    n_changes: int = 0
+
+    def reset(self, nesting_cols: list[str]) -> None:
+        if nesting_cols != self.nesting_cols:
+            self.nesting_cols = list(nesting_cols)
+            self.expanded_paths.clear()
+            self.leaves_limits.clear()
+            self.n_changes += 1
+
+    def select(self, node: TreeNode, max_leaves: int) -> bool:
+        """Expands (or collapses) the selected node, True if anything changed."""
+        if node.kind == 'group':
+            self.expanded_paths ^= {node.path}
+        elif node.kind == 'more':
+            self.leaves_limits[node.path] = (
+                self.leaves_limits.get(node.path, max_leaves) + max_leaves
+            )
+        else:
+            return False
+        self.n_changes += 1
+        return True
 
-def get_sac_tree_items(transactions_df: pd.DataFrame, nesting_cols: list[str]):
-    transactions_df = transactions_df.copy()
-    transactions_df.sort_values(nesting_cols, inplace=True)
 
-    items, items_lookup = _prepare_items_tree(
-        transactions_df=transactions_df, nesting_cols=nesting_cols
+def _get_total_tag(n_transactions: int, total_amount: float) -> list[sac.Tag]:
+    return [
+        sac.Tag(n_transactions),
+        sac.Tag(
+            f"total: {total_amount:,.2f} zł",
+            color='green' if total_amount > 0 else 'yellow',
+        ),
+    ]
+
+
+def _get_transaction_item(t) -> sac.TreeItem:
+    return sac.TreeItem(
+        " | ".join(
+            [
+                t.__getattribute__(TransactionColumn.TRANSACTION_DATE_ISOSTR),
+                t.__getattribute__(TransactionColumn.TITLE),
+                t.__getattribute__(TransactionColumn.CONTRACTOR),
+            ]
+        ),
+        tag=sac.Tag(
+            f"{t.amount_abs:,.2f} zł",
+            color={
+                TransactionType.INCOME: 'green',
+                TransactionType.OUTCOME: 'yellow',
+            }[t.type],
+        ),
     )
 
-    for path in items_lookup.keys():
-        mask = pd.Series(True, index=transactions_df.index)
-        for column, value in zip(nesting_cols, path):
-            mask = mask & (transactions_df[column] == value)
-
-        total_amount = sum(transactions_df[mask][TransactionColumn.AMOUNT])
-        n_transactions = sum(mask)
-        items_lookup[path].tag = [
-            sac.Tag(n_transactions),
-            sac.Tag(
-                f"total: {total_amount:,.2f} zł",
-                color='green' if total_amount > 0 else 'yellow',
-            ),
-        ]
-
-    for group_values, group_transactions_df in transactions_df.groupby(nesting_cols):
-        items_lookup[tuple(group_values)].children = [
-            sac.TreeItem(
-                " | ".join(
-                    [
-                        t.__getattribute__(TransactionColumn.TRANSACTION_DATE_ISOSTR),
-                        t.__getattribute__(TransactionColumn.TITLE),
-                        t.__getattribute__(TransactionColumn.CONTRACTOR),
-                    ]
-                ),
-                tag=sac.Tag(
-                    f"{t.amount_abs:,.2f} zł",
-                    color={
-                        TransactionType.INCOME: 'green',
-                        TransactionType.OUTCOME: 'yellow',
-                    }[t.type],
-                ),
-            )
-            for t in group_transactions_df.itertuples()
-        ]
 
+def _get_levels_totals(
+    transactions_df: pd.DataFrame, nesting_cols: list[str]
+) -> list[dict[tuple, tuple[int, float]]]:
+    """
+    Number of transactions and total amount of the groups of every nesting
+    level, computed with a single aggregation per level.
+    """
+    levels_totals = []
+    for depth in range(1, len(nesting_cols) + 1):
+        totals_df = transactions_df.groupby(nesting_cols[:depth], observed=True).agg(
+            n_transactions=(TransactionColumn.AMOUNT, "size"),
+            total_amount=(TransactionColumn.AMOUNT, "sum"),
+        )
+        levels_totals.append(
+            {
+                path if isinstance(path, tuple) else (path,): (int(n), total)
+                for path, n, total in zip(
+                    totals_df.index.to_flat_index(),
+                    totals_df["n_transactions"],
+                    totals_df["total_amount"],
+                )
+            }
+        )
+    return levels_totals
+
+
+def get_lazy_sac_tree_items(
+    transactions_df: pd.DataFrame,
+    nesting_cols: list[str],
+    expansion: TreeExpansion | None = None,
+    max_leaves: int | None = None,
+    expand_all: bool = False,
+) -> tuple[list[sac.TreeItem], list[TreeNode]]:
+    """
+    Tree items of the groups, only groups expanded in `expansion` (or all of
+    them with `expand_all`) get their children. Groups of the last level show
+    at most `max_leaves` of their biggest transactions, followed by a "more…"
+    item.
+
+    Returns also the nodes in the order `sac.tree` indexes the items, so that
+    a selected index can be passed to `TreeExpansion.select`.
+    """
+    expansion = expansion or TreeExpansion()
+    transactions_df = transactions_df.sort_values(nesting_cols, kind="stable")
+    levels_totals = _get_levels_totals(transactions_df, nesting_cols)
+    n_levels = len(nesting_cols)
+
+    children_paths: dict[tuple, list[tuple]] = {}
+    for level_totals in levels_totals:
+        for path in level_totals:
+            children_paths.setdefault(path[:-1], []).append(path)
+    leaves_rows = transactions_df.groupby(nesting_cols, observed=True).indices
+    amounts_abs = transactions_df[TransactionColumn.AMOUNT_ABS].to_numpy()
+    # all leaves are shown, one pass over the rows is cheaper than one per group
+    all_transactions = list(transactions_df.itertuples()) if expand_all else None
+
+    nodes = []
+
+    def get_group_item(path: tuple) -> sac.TreeItem:
+        # pre-order, the same as the indexes of sac.tree
+        nodes.append(TreeNode('group', path))
+        item = sac.TreeItem(
+            path[-1],
+            children=[],
+            tag=_get_total_tag(*levels_totals[len(path) - 1][path]),
+        )
+        if not expand_all and path not in expansion.expanded_paths:
+            item.description = "select to expand"
+            return item
+
+        if len(path) < n_levels:
+            item.children = [get_group_item(p) for p in children_paths[path]]
+            return item
+
+        rows = leaves_rows[path if n_levels > 1 else path[0]]
+        limit = expansion.leaves_limits.get(path, max_leaves)
+        n_more = 0 if limit is None else max(0, len(rows) - limit)
+        if n_more:
+            # biggest transactions, in their original order
+            biggest = np.argsort(-amounts_abs[rows], kind="stable")[:limit]
+            rows = rows[np.sort(biggest)]
+        if all_transactions is not None:
+            transactions = [all_transactions[i] for i in rows]
+        else:
+            transactions = transactions_df.iloc[rows].itertuples()
+        for t in transactions:
+            nodes.append(TreeNode('transaction', path))
+            item.children.append(_get_transaction_item(t))
+        if n_more:
+            nodes.append(TreeNode('more', path))
+            item.children.append(sac.TreeItem(f"{n_more} more…"))
+        return item
+
+    items = [get_group_item(path) for path in children_paths.get((), [])]
+    return items, nodes
+
+
+def get_sac_tree_items(transactions_df: pd.DataFrame, nesting_cols: list[str]):
+    items, _ = get_lazy_sac_tree_items(transactions_df, nesting_cols, expand_all=True)
     return items
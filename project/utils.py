@@ -1,6 +1,8 @@
 import hashlib
 import os
 
+import pandas as pd
+
 from project.constants import UNRECOGNIZED
 
 
@@ -14,6 +16,25 @@ def hash_string(string: str) -> str:
     return hash_hex
 
 
+def hash_rows(df: pd.DataFrame, compact: bool = False) -> pd.Series:
+    """
+    Hash of each row. By default sha256 hex digest of the row values joined as
+    strings (same as `hash_string("".join([str(v) for v in row]))`), with
+    `compact` a 64-bit integer hash.
+    """
+    if compact:
+        return pd.util.hash_pandas_object(df, index=False).astype("int64")
+
+    keys = pd.Series("", index=df.index)
+    for col in df.columns:
+        keys = keys + df[col].astype(str)
+    return pd.Series(
+        [hashlib.sha256(key.encode()).hexdigest() for key in keys],
+        index=df.index,
+        dtype=object,
+    )
+
+
 def calculate_md5(file_path: str) -> str:
     hash_md5 = hashlib.md5()
 
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from project import caching
+from project.caching import CachePolicy, estimate_n_bytes, memoize
+from project.dataset import DATASET_HASH_FUNCS, Dataset
+
+
+def test_memoize_evicts_least_recently_used():
+    calls = []
+
+    @memoize(CachePolicy(max_entries=2, max_bytes=None, ttl_seconds=None))
+    def square(x: int, power: int = 2) -> int:
+        calls.append(x)
+        return x**power
+
+    assert [square(1), square(2), square(1), square(x=2, power=2)] == [1, 4, 1, 4]
+    square(3)  # evicts 1, the least recently used
+    square(2)
+    square(1)
+
+    assert calls == [1, 2, 3, 1]
+    assert square.stats.hits == 3
+    assert square.stats.misses == 4
+    assert square.stats.evictions == 2
+    assert square.stats.n_entries == 2
+
+
+def test_memoize_evicts_by_size_and_age(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(caching.time, "monotonic", lambda: now[0])
+    df = pd.DataFrame({"amount": range(1000)})
+
+    @memoize(
+        CachePolicy(
+            max_entries=10, max_bytes=int(estimate_n_bytes(df) * 1.5), ttl_seconds=60
+        ),
+        hash_funcs=DATASET_HASH_FUNCS,
+    )
+    def total(dataset: Dataset) -> pd.DataFrame:
+        return dataset.df.copy()
+
+    total(Dataset(df=df, version="a"))
+    total(Dataset(df=df, version="b"))
+    assert total.stats.n_entries == 1
+    assert total.stats.n_bytes == estimate_n_bytes(df)
+
+    now[0] = 61.0
+    total(Dataset(df=df, version="b"))
+    assert total.stats.misses == 3
+    assert total.stats.evictions == 2
+
+
+def test_memoize_refuses_dataframe_arguments():
+    @memoize()
+    def identity(df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+    with pytest.raises(TypeError):
+        identity(pd.DataFrame())
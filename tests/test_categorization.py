@@ -0,0 +1,232 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project.aho_corasick import AhoCorasick
+from project.categories import (
+    CategoriesCache,
+    CategoriesRules,
+    CategoryRule,
+    Condition,
+    Relation,
+    read_categories_rules,
+)
+from project.categorization import CategorizationEngine
+from project.constants import UNRECOGNIZED
+from project.transactions_read import get_category
+
+
+@pytest.fixture
+def categories_rules() -> CategoriesRules:
+    return CategoriesRules(
+        items=[
+            CategoryRule(
+                0, "groceries", [Condition("contractor", Relation.equals, "Kroger")]
+            ),
+            CategoryRule(
+                1, "transfer", [Condition("transaction_id", Relation.equals, "2")]
+            ),
+            CategoryRule(
+                2,
+                "restaurants",
+                [
+                    Condition("contractor", Relation.contains, "Pizza"),
+                    Condition("title", Relation.contains, "card"),
+                ],
+            ),
+            CategoryRule(
+                3, "groceries", [Condition("title", Relation.contains, "food")]
+            ),
+            CategoryRule(
+                4,
+                "shop-big",
+                [
+                    Condition("contractor", Relation.equals, "Shop"),
+                    Condition("amount", Relation.is_lower_than, "-100"),
+                ],
+            ),
+            CategoryRule(
+                5, "small", [Condition("amount", Relation.is_lower_than, "-100")]
+            ),
+            CategoryRule(
+                6, "never", [Condition("contractor", Relation.equals, "Kroger")]
+            ),
+            CategoryRule(7, "bar", [Condition("contractor", Relation.equals, "Bar")]),
+            CategoryRule(
+                None, UNRECOGNIZED, [Condition("title", Relation.contains, "")]
+            ),
+        ],
+        csv_md5="",
+    )
+
+
+@pytest.fixture
+def transactions_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "transaction_id": [1, 2, 3, 4, 5, 6, 7, 8],
+            "contractor": [
+                "Kroger",
+                "Kroger",
+                "Pizza Hut",
+                "Pizza Hut",
+                "Shop",
+                "Shop",
+                "Pizza",
+                "Bar",
+            ],
+            "title": [
+                "food",
+                "card",
+                "card payment",
+                "transfer",
+                "food",
+                "card",
+                "fast food",
+                "x",
+            ],
+            "amount": [-10.0, 100.0, -20.0, -500.0, -5.0, -150.0, -12.0, 3.0],
+        },
+        index=[10, 11, 12, 13, 14, 15, 16, 17],
+    )
+
+
+def test_categorize_matches_get_category(categories_rules, transactions_df):
+    categorized_df = CategorizationEngine(categories_rules).categorize(transactions_df)
+
+    for i_row, row in transactions_df.iterrows():
+        expected_rule = get_category(row, categories_rules.items)
+        assert categorized_df.loc[i_row, "category"] == expected_rule.category
+        expected_rule_id = (
+            np.nan if expected_rule.rule_id is None else expected_rule.rule_id
+        )
+        np.testing.assert_equal(
+            categorized_df.loc[i_row, "category_rule_id"], expected_rule_id
+        )
+
+
+def test_categorize_without_fallback_rule(categories_rules, transactions_df):
+    categories_rules.items = categories_rules.items[:1]
+
+    categorized_df = CategorizationEngine(categories_rules).categorize(transactions_df)
+
+    assert list(categorized_df["category"]) == ["groceries"] * 2 + [UNRECOGNIZED] * 6
+    assert categorized_df["category_rule_id"].isna().sum() == 6
+
+
+def test_aho_corasick():
+    matcher = AhoCorasick([("he", 5), ("she", 1), ("his", 2), ("hers", 3), ("e", 4)])
+
+    assert matcher.find_all("ushers") == {5, 1, 3, 4}
+    assert matcher.find_min("ushers") == 1
+    assert matcher.find_all("hi") == set()
+    assert matcher.find_min("hi") is None
+
+
+def test_categorize_many_contains_rules_matches_get_category():
+    rng = np.random.default_rng(0)
+    alphabet = list("abcd ")
+    items = [
+        CategoryRule(
+            i_rule,
+            f"category_{i_rule % 7}",
+            [
+                Condition(
+                    column,
+                    Relation.contains,
+                    "".join(rng.choice(alphabet, size=rng.integers(1, 4))),
+                )
+            ],
+        )
+        for i_rule, column in enumerate(rng.choice(["title", "contractor"], 60))
+    ]
+    categories_rules = CategoriesRules(items=items, csv_md5="")
+    transactions_df = pd.DataFrame(
+        {
+            column: ["".join(rng.choice(alphabet, size=8)) for _ in range(300)]
+            for column in ["title", "contractor"]
+        }
+    )
+
+    categorized_df = CategorizationEngine(categories_rules).categorize(transactions_df)
+
+    expected_categories = [
+        getattr(get_category(row, items), "category", UNRECOGNIZED)
+        for _, row in transactions_df.iterrows()
+    ]
+    assert list(categorized_df["category"]) == expected_categories
+
+
+def test_read_categories_rules_indexes_equals_conditions(tmp_path):
+    csv_path = tmp_path / "categories_conditions.csv"
+    csv_path.write_text(
+        "rule_id,column,relation,value,category\n"
+        "0,contractor,equals,Kroger,groceries\n"
+        "1,title,contains,food,groceries\n"
+        "2,title,contains,card,shopping\n"
+        "2,contractor,equals,Shop,shopping\n"
+        "3,contractor,equals,Kroger,other\n"
+    )
+
+    categories_rules = read_categories_rules(str(csv_path))
+
+    assert categories_rules.equals_index == {
+        "contractor": {"Kroger": [0, 3], "Shop": [2]}
+    }
+
+
+def test_categories_cache_writes_only_changed_categories(
+    categories_rules, tmp_path, caplog
+):
+    cache_file_path = str(tmp_path / "categories_cache.sqlite")
+    transactions_df = pd.DataFrame(
+        {
+            "transaction_id": [1, "b", "c"],
+            "category": ["groceries", "transfer", UNRECOGNIZED],
+            "category_rule_id": [0.0, 1.0, np.nan],
+        }
+    )
+    CategoriesCache(file_path=cache_file_path).write(transactions_df, categories_rules)
+
+    categories_cache = CategoriesCache(file_path=cache_file_path)
+    categories_cache.read()
+    categories_df = categories_cache.get_categories(
+        pd.Series(["c", "x", 1], index=[5, 6, 7])
+    )
+    assert categories_cache.rules_csv_md5 == categories_rules.csv_md5
+    assert categories_cache.first_changed_rule_id(categories_rules) == float("inf")
+    assert list(categories_df.index) == [5, 6, 7]
+    assert list(categories_df["category"].fillna("")) == [UNRECOGNIZED, "", "groceries"]
+
+    transactions_df.loc[1, "category"] = "other"
+    with caplog.at_level(logging.INFO):
+        categories_cache.write(transactions_df, categories_rules)
+    assert "Saved categories of 1 transactions" in caplog.text
+
+
+def test_categories_cache_prunes_removed_transactions(categories_rules, tmp_path):
+    cache_file_path = str(tmp_path / "categories_cache.sqlite")
+    transactions_df = pd.DataFrame(
+        {
+            "transaction_id": [1, "b", "c"],
+            "category": ["groceries", "transfer", UNRECOGNIZED],
+            "category_rule_id": [0.0, 1.0, np.nan],
+        }
+    )
+    categories_cache = CategoriesCache(file_path=cache_file_path)
+    categories_cache.write(transactions_df, categories_rules)
+
+    categories_cache.keep(pd.Series(["c", 1]))
+    categories_cache.keep(pd.Series(["new"]))
+    categories_cache.prune()
+
+    categories_df = CategoriesCache(file_path=cache_file_path).get_categories(
+        pd.Series([1, "b", "c"])
+    )
+    assert list(categories_df["category"].fillna("")) == ["groceries", "", UNRECOGNIZED]
+
+    # the next prune keeps only transactions marked after the previous one
+    categories_cache.prune()
+    assert categories_cache.is_empty
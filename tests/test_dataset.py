@@ -0,0 +1,31 @@
+import threading
+
+import pandas as pd
+
+from project.dataset import Dataset, DatasetStore
+
+
+def test_dataset_store_loads_each_version_once():
+    store = DatasetStore()
+    loaded_versions = []
+
+    def loader(version: str):
+        def load() -> Dataset:
+            loaded_versions.append(version)
+            return Dataset(df=pd.DataFrame({"amount": [1.0]}), version=version)
+
+        return load
+
+    threads = [
+        threading.Thread(target=store.get, args=("v1", loader("v1"))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    dataset = store.get("v1", loader("v1"))
+
+    assert loaded_versions == ["v1"]
+    assert store.get("v1", loader("v1")) is dataset
+    assert store.get("v2", loader("v2")).version == "v2"
+    assert loaded_versions == ["v1", "v2"]
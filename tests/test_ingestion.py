@@ -0,0 +1,121 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from project import ingestion
+from project.ingestion import (
+    IngestionManifest,
+    iter_csv_files_chunks,
+    read_csv_files_incrementally,
+)
+from project.transactions_read import (
+    discover_csv_files,
+    parse_csv_files_as_df,
+)
+
+DEMO_TRANSACTIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data_demo", "transactions"
+)
+
+
+@pytest.fixture
+def transactions_dir(tmp_path):
+    transactions_dir = tmp_path / "transactions"
+    shutil.copytree(DEMO_TRANSACTIONS_DIR, transactions_dir)
+    return str(transactions_dir)
+
+
+def _read(transactions_dir: str, tmp_path) -> pd.DataFrame:
+    cache_dir = tmp_path / "parsed"
+    cache_dir.mkdir(exist_ok=True)
+    manifest = IngestionManifest(
+        file_path=str(tmp_path / "manifest.csv"), cache_dir=str(cache_dir)
+    )
+    manifest.read()
+    return read_csv_files_incrementally(discover_csv_files(transactions_dir), manifest)
+
+
+def test_read_csv_files_incrementally_uses_cache(
+    transactions_dir, tmp_path, monkeypatch
+):
+    expected_df = parse_csv_files_as_df(discover_csv_files(transactions_dir))
+    first_df = _read(transactions_dir, tmp_path)
+    pd.testing.assert_frame_equal(first_df, expected_df)
+
+    def fail(csv_files, max_workers):
+        assert csv_files == [], "unchanged file parsed again"
+        return []
+
+    monkeypatch.setattr(ingestion, "parse_csv_files", fail)
+    second_df = _read(transactions_dir, tmp_path)
+    pd.testing.assert_frame_equal(second_df, expected_df)
+
+
+def test_read_csv_files_incrementally_reparses_modified_file(
+    transactions_dir, tmp_path
+):
+    _read(transactions_dir, tmp_path)
+
+    file_path = os.path.join(transactions_dir, "generic", "fake_transactions.csv")
+    with open(file_path) as f:
+        header, first_line, *_ = f.readlines()
+    with open(file_path, "w") as f:
+        f.writelines([header, first_line])
+
+    df = _read(transactions_dir, tmp_path)
+    assert len(df) == 1
+    assert len(os.listdir(tmp_path / "parsed")) == 1
+
+
+def test_manifest_fingerprint_changes_only_with_content(transactions_dir, tmp_path):
+    def fingerprint() -> str:
+        manifest = IngestionManifest(
+            file_path=str(tmp_path / "manifest.csv"), cache_dir=str(tmp_path / "parsed")
+        )
+        manifest.read()
+        return manifest.fingerprint(discover_csv_files(transactions_dir))
+
+    _read(transactions_dir, tmp_path)
+    parsed_fingerprint = fingerprint()
+
+    file_path = os.path.join(transactions_dir, "generic", "fake_transactions.csv")
+    os.utime(file_path, ns=(0, 0))
+    assert fingerprint() == parsed_fingerprint
+
+    with open(file_path, "a") as f:
+        f.write("\n")
+    assert fingerprint() != parsed_fingerprint
+
+
+def test_iter_csv_files_chunks_same_as_reading_whole_files(
+    transactions_dir, tmp_path, monkeypatch
+):
+    expected_df = parse_csv_files_as_df(discover_csv_files(transactions_dir))
+
+    def read_chunks() -> list[pd.DataFrame]:
+        manifest = IngestionManifest(
+            file_path=str(tmp_path / "manifest.csv"), cache_dir=str(tmp_path / "parsed")
+        )
+        manifest.read()
+        return list(
+            iter_csv_files_chunks(
+                discover_csv_files(transactions_dir), manifest, chunk_size=300
+            )
+        )
+
+    (tmp_path / "parsed").mkdir()
+    dfs = read_chunks()
+    assert max(len(df) for df in dfs) == 300
+    pd.testing.assert_frame_equal(pd.concat(dfs, ignore_index=True), expected_df)
+
+    def fail(csv_file, chunk_size):
+        raise AssertionError("unchanged file parsed again")
+
+    monkeypatch.setattr(ingestion, "parse_csv_file_chunks", fail)
+    pd.testing.assert_frame_equal(
+        pd.concat(read_chunks(), ignore_index=True), expected_df
+    )
+    # cached in chunks, read whole
+    pd.testing.assert_frame_equal(_read(transactions_dir, tmp_path), expected_df)
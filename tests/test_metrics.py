@@ -0,0 +1,100 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project.metrics import get_metrics, get_metrics_history
+from project.dataset import Dataset
+from project.transactions_rollup import get_monthly_rollup
+
+
+@pytest.fixture
+def transactions_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = pd.Series(
+        pd.to_datetime("2023-11-01")
+        + pd.to_timedelta(rng.integers(0, 90 * 24 * 60, 300), unit="min")
+    ).sort_values(ignore_index=True)
+    amount = rng.normal(0, 100, 300).round(2)
+    return pd.DataFrame(
+        {
+            "transaction_date": dates,
+            "year_month": dates.dt.year * 100 + dates.dt.month,
+            "category": rng.choice(["groceries", "unrecognized", "tax"], 300),
+            "account_name": rng.choice(["a", "b"], 300),
+            "amount": amount,
+            "amount_abs": np.abs(amount),
+            "type": np.where(amount >= 0, "income", "outcome"),
+        }
+    )
+
+
+def _expected_month_metrics(transactions_df: pd.DataFrame, month: datetime) -> dict:
+    month_df = transactions_df[
+        transactions_df["year_month"] == month.year * 100 + month.month
+    ]
+    income_df = month_df[month_df["type"] == "income"]
+    expense_df = month_df[month_df["type"] == "outcome"]
+    return {
+        "income": income_df["amount_abs"].sum(),
+        "expense": expense_df["amount_abs"].sum(),
+        "savings": income_df["amount_abs"].sum() - expense_df["amount_abs"].sum(),
+        "n_expense_transactions": len(expense_df),
+        "n_unrecognized_expense_transactions": sum(
+            expense_df["category"] == "unrecognized"
+        ),
+        "day_of_last_transaction": (
+            expense_df["transaction_date"].max().day if len(expense_df) else None
+        ),
+    }
+
+
+def test_metrics_history_matches_transactions(transactions_df):
+    rollup = get_monthly_rollup(Dataset.from_df(transactions_df))
+    reference_date = datetime(2024, 1, 15)
+
+    with patch("project.dates_utils.NOW", reference_date):
+        history_df = get_metrics_history(rollup, n_months=4)
+
+    assert list(history_df.index.strftime("%Y-%m")) == [
+        "2023-10",
+        "2023-11",
+        "2023-12",
+        "2024-01",
+    ]
+    assert history_df.iloc[0].isna().sum() == 1  # no day of last transaction
+    for month, row in history_df.iterrows():
+        expected = _expected_month_metrics(transactions_df, month)
+        for column in ["income", "expense", "savings"]:
+            assert row[column] == pytest.approx(expected[column])
+        for column in [
+            "n_expense_transactions",
+            "n_unrecognized_expense_transactions",
+        ]:
+            assert row[column] == expected[column]
+        if expected["day_of_last_transaction"] is None:
+            assert pd.isna(row["day_of_last_transaction"])
+        else:
+            assert row["day_of_last_transaction"] == expected["day_of_last_transaction"]
+
+
+def test_metrics_of_last_history_month(transactions_df):
+    rollup = get_monthly_rollup(Dataset.from_df(transactions_df)).exclude_categories(
+        ["tax"]
+    )
+    with patch("project.dates_utils.NOW", datetime(2024, 1, 15)):
+        history_df = get_metrics_history(rollup, n_months=4)
+
+    metrics = get_metrics(history_df)
+
+    income, *_, day_of_last_transaction = metrics
+    assert income.name == "January 2024 total income"
+    assert income.value == pytest.approx(history_df["income"].iloc[-1])
+    assert income.delta == pytest.approx(
+        history_df["income"].iloc[-1] - history_df["income"].iloc[-2]
+    )
+    assert income.history == pytest.approx(list(history_df["income"]))
+    assert day_of_last_transaction.delta is None
+    assert day_of_last_transaction.history[0] is None
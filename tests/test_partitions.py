@@ -0,0 +1,113 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project.dataset import Dataset
+from project.partitions import PartitionedStore
+
+
+@pytest.fixture
+def dataset() -> Dataset:
+    rng = np.random.default_rng(0)
+    dates = pd.to_datetime("2022-01-01") + pd.to_timedelta(
+        np.sort(rng.integers(0, 3 * 365 * 24, 1000)), unit="h"
+    )
+    df = pd.DataFrame(
+        {
+            "transaction_date": dates,
+            "category": pd.Categorical(rng.choice(["food", "bills"], 1000)),
+            "amount": rng.normal(0, 100, 1000).round(2),
+            "year_month": (dates.year * 100 + dates.month).astype("int32"),
+        }
+    )
+    return Dataset.from_df(df, categories=("bills", "food"))
+
+
+@pytest.mark.parametrize(
+    "start_datetime, end_datetime",
+    [
+        (datetime(2023, 3, 1), datetime(2023, 3, 31, 23, 59, 59)),
+        (datetime(2022, 12, 15), datetime(2023, 2, 10)),
+        (None, datetime(2022, 6, 1)),
+        (None, None),
+        (datetime(2023, 1, 1), datetime(2022, 1, 1)),
+    ],
+)
+def test_read_range_same_as_filtering(dataset, tmp_path, start_datetime, end_datetime):
+    store = PartitionedStore(root_dir=str(tmp_path / "partitioned"))
+    store.write(dataset)
+
+    range_dataset = store.read(start_datetime, end_datetime)
+
+    dates = dataset.df["transaction_date"]
+    expected_df = dataset.df[
+        (dates >= (start_datetime or dates.min()))
+        & (dates <= (end_datetime or dates.max()))
+    ]
+    pd.testing.assert_frame_equal(
+        range_dataset.df, expected_df.reset_index(drop=True), check_categorical=False
+    )
+    assert range_dataset.categories == dataset.categories
+
+
+def test_read_range_reads_only_its_partitions(dataset, tmp_path):
+    root_dir = str(tmp_path / "partitioned")
+    store = PartitionedStore(root_dir=root_dir)
+    assert store.version is None
+    store.write(dataset)
+    assert store.version == dataset.version
+
+    partitions_dir = os.path.join(root_dir, store._read_metadata()["dir_name"])
+    os.remove(
+        os.path.join(partitions_dir, "year=2022", "month=05", "transactions.parquet")
+    )
+    range_dataset = store.read(datetime(2023, 3, 1), datetime(2023, 4, 30))
+
+    assert set(range_dataset.df["year_month"]) == {202303, 202304}
+
+    store.write(Dataset.from_df(dataset.df.iloc[:10]))
+    assert len(store.read().df) == 10
+
+
+def test_write_keeps_partitions_of_previous_write(dataset, tmp_path):
+    store = PartitionedStore(root_dir=str(tmp_path / "partitioned"))
+    store.write(dataset)
+    first_dir_name = store._read_metadata()["dir_name"]
+    store.write(Dataset.from_df(dataset.df.iloc[:10]))
+    second_dir_name = store._read_metadata()["dir_name"]
+
+    # readers which loaded the metadata before the second write still find it
+    assert os.path.exists(os.path.join(store.root_dir, first_dir_name))
+
+    store.write(Dataset.from_df(dataset.df.iloc[:20]))
+    assert sorted(os.listdir(store.root_dir)) == sorted(
+        ["current.json", second_dir_name, store._read_metadata()["dir_name"]]
+    )
+    assert len(store.read().df) == 20
+
+
+def test_read_without_partitions(tmp_path):
+    store = PartitionedStore(root_dir=str(tmp_path / "partitioned"))
+    with pytest.raises(FileNotFoundError):
+        store.read()
+
+
+def test_read_range_of_partitions_with_null_columns(dataset, tmp_path):
+    # descriptions of mbank transactions only, none in some months
+    df = dataset.df.assign(
+        description=np.where(dataset.df["year_month"] % 2 == 0, "Platnosc karta", None),
+        account_name=pd.Categorical(
+            np.where(dataset.df["year_month"] % 2 == 0, "mbank", "ing")
+        ),
+    )
+    store = PartitionedStore(root_dir=str(tmp_path / "partitioned"))
+    store.write(Dataset.from_df(df, categories=dataset.categories))
+
+    range_df = store.read(datetime(2023, 1, 1), datetime(2023, 4, 30)).df
+
+    is_null_month = range_df["description"].isna().groupby(range_df["year_month"])
+    assert list(is_null_month.all()) == [True, False, True, False]
+    assert len(store.read().df) == len(df)
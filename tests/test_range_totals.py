@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project.range_totals import get_transactions_totals_df
+
+
+@pytest.fixture
+def transactions_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    amount = rng.normal(0, 100, 2000).round(2)
+    return pd.DataFrame(
+        {
+            "transaction_date": pd.to_datetime("2014-01-01")
+            + pd.to_timedelta(rng.integers(0, 10 * 365, 2000), unit="D"),
+            "category": rng.choice(["food", "bills", "rent"], 2000),
+            "type": np.where(amount > 0, "income", "outcome"),
+            "amount": amount,
+            "amount_abs": np.abs(amount),
+        }
+    )
+
+
+def test_transactions_totals_of_every_group(transactions_df):
+    dates = transactions_df["transaction_date"]
+    range_df = transactions_df[
+        (dates >= datetime(2016, 3, 1))
+        & (dates <= datetime(2017, 3, 1))
+        & transactions_df["category"].isin(["food", "bills"])
+    ]
+
+    totals_df = get_transactions_totals_df(range_df, "category")
+
+    assert list(totals_df.columns) == ["income", "outcome", "delta", "n_transactions"]
+    assert list(totals_df.index) == ["bills", "food"]
+    for category, totals in totals_df.iterrows():
+        category_df = range_df[range_df["category"] == category]
+        income = category_df.loc[category_df["type"] == "income", "amount_abs"].sum()
+        outcome = category_df.loc[category_df["type"] == "outcome", "amount_abs"].sum()
+        assert totals["income"] == pytest.approx(income)
+        assert totals["outcome"] == pytest.approx(outcome)
+        assert totals["delta"] == pytest.approx(income - outcome)
+        assert totals["n_transactions"] == len(category_df)
+
+
+def test_transactions_totals_of_one_type_only(transactions_df):
+    outcome_df = transactions_df[transactions_df["type"] == "outcome"]
+
+    totals_df = get_transactions_totals_df(outcome_df, "category")
+
+    assert (totals_df["income"] == 0.0).all()
+    np.testing.assert_allclose(totals_df["delta"], -totals_df["outcome"])
+
+
+def test_transactions_totals_of_no_transactions(transactions_df):
+    totals_df = get_transactions_totals_df(transactions_df.iloc[:0], "category")
+
+    assert len(totals_df) == 0
+    assert list(totals_df.columns) == ["income", "outcome", "delta", "n_transactions"]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from project import snapshot
+from project.dataset import Dataset
+from project.snapshot import read_snapshot, write_snapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    file_path = str(tmp_path / "dataset_snapshot.arrow")
+    df = pd.DataFrame(
+        {
+            "transaction_date": pd.to_datetime(["2024-01-05", "2024-02-01"]),
+            "category": pd.Categorical(["food", "unrecognized"]),
+            "category_rule_id": pd.array([3, None], dtype="Int64"),
+            "title": ["a", "b"],
+            "amount": [-1.5, 2.0],
+        }
+    )
+    write_snapshot(Dataset(df=df, version="v1", categories=("food",)), file_path)
+
+    dataset = read_snapshot(file_path, "v1")
+
+    pd.testing.assert_frame_equal(dataset.df, df)
+    assert dataset.categories == ("food",)
+    assert np.sum(dataset.df["amount"]) == 0.5  # still readable, file closed
+    assert read_snapshot(file_path, "v2") is None
+    assert read_snapshot(str(tmp_path / "missing.arrow"), "v1") is None
+
+
+def test_snapshot_of_other_snapshot_version_is_outdated(tmp_path, monkeypatch):
+    file_path = str(tmp_path / "dataset_snapshot.arrow")
+    df = pd.DataFrame({"amount": [-1.5, 2.0]})
+    write_snapshot(Dataset(df=df, version="v1", categories=()), file_path)
+
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+
+    assert read_snapshot(file_path, "v1") is None
@@ -0,0 +1,206 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from project.categories import CategoriesCache, read_categories_rules
+from project.dataset import Dataset
+from project.range_totals import get_transactions_totals_df
+from project.ingestion import IngestionManifest, iter_csv_files_chunks
+from project.sql_backend import SqlTransactionsStore
+from project.transactions_aggregation import get_file_path_aggregated_df
+from project.transactions_read import (
+    add_columns,
+    add_columns_in_chunks,
+    discover_csv_files,
+    parse_csv_files_as_df,
+)
+from project.transactions_rollup import get_monthly_rollup
+
+DEMO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data_demo")
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory) -> Dataset:
+    categories_cache = CategoriesCache(
+        file_path=str(tmp_path_factory.mktemp("cache") / "categories_cache.sqlite")
+    )
+    categories_cache.read()
+    df = add_columns(
+        parse_csv_files_as_df(
+            discover_csv_files(os.path.join(DEMO_DIR, "transactions"))
+        ),
+        read_categories_rules(
+            os.path.join(DEMO_DIR, "categories", "categories_conditions.csv"),
+            add_fallback=True,
+        ),
+        categories_cache,
+    )
+    return Dataset.from_df(df, categories=tuple(sorted(set(df["category"]))))
+
+
+@pytest.fixture(scope="module")
+def store(dataset, tmp_path_factory) -> SqlTransactionsStore:
+    store = SqlTransactionsStore(
+        file_path=str(tmp_path_factory.mktemp("sql") / "transactions.sqlite")
+    )
+    assert store.version is None
+    store.write(dataset)
+    return store
+
+
+def test_store_keeps_version_and_categories(dataset, store):
+    assert store.version == dataset.version
+    assert store.categories == list(dataset.categories)
+
+
+def _filter(df, start_datetime=None, end_datetime=None, categories=None, types=None):
+    mask = pd.Series(True, index=df.index)
+    if start_datetime:
+        mask &= df["transaction_date"] >= start_datetime
+    if end_datetime:
+        mask &= df["transaction_date"] <= end_datetime
+    if categories is not None:
+        mask &= df["category"].isin(categories)
+    if types is not None:
+        mask &= df["type"].isin(types)
+    return df[mask]
+
+
+@pytest.mark.parametrize(
+    "start_datetime, end_datetime, categories, types",
+    [
+        (None, None, None, None),
+        (datetime(2023, 3, 1), datetime(2023, 5, 31, 23, 59, 59), None, None),
+        (None, None, ["unrecognized"], ["outcome"]),
+        (datetime(2023, 3, 1), None, [], None),
+    ],
+)
+def test_filter_transactions_same_as_pandas(
+    dataset, store, start_datetime, end_datetime, categories, types
+):
+    df = store.filter_transactions(start_datetime, end_datetime, categories, types)
+
+    expected_df = _filter(dataset.df, start_datetime, end_datetime, categories, types)
+    pd.testing.assert_frame_equal(
+        df, expected_df.reset_index(drop=True), check_categorical=False
+    )
+
+
+def test_monthly_rollup_same_as_pandas(dataset, store):
+    rollup_df = store.get_monthly_rollup().df
+    expected_rollup_df = get_monthly_rollup(dataset).df
+
+    pd.testing.assert_frame_equal(
+        rollup_df.reset_index(),
+        expected_rollup_df.reset_index(),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+@pytest.mark.parametrize("group_by_col", ["category", "account_name", "one_group"])
+def test_range_totals_same_as_pandas(dataset, store, group_by_col):
+    kwargs = dict(
+        group_by_col=group_by_col,
+        categories=["unrecognized", "food"],
+        start_datetime=datetime(2023, 2, 1),
+        end_datetime=datetime(2023, 8, 1),
+    )
+
+    pd.testing.assert_frame_equal(
+        store.get_range_totals_df(**kwargs),
+        get_transactions_totals_df(
+            _filter(
+                dataset.df,
+                kwargs["start_datetime"],
+                kwargs["end_datetime"],
+                kwargs["categories"],
+            ),
+            group_by_col,
+        ),
+        check_index_type=False,
+        check_dtype=False,
+        check_categorical=False,
+    )
+    with pytest.raises(ValueError):
+        store.get_range_totals_df(**{**kwargs, "group_by_col": "1; DROP TABLE"})
+
+
+def test_file_path_aggregated_df_same_as_pandas(dataset, store):
+    pd.testing.assert_frame_equal(
+        store.get_file_path_aggregated_df(),
+        get_file_path_aggregated_df(dataset.df),
+        check_index_type=False,
+        check_categorical=False,
+    )
+
+
+def test_store_of_empty_stream(tmp_path):
+    store = SqlTransactionsStore(file_path=str(tmp_path / "transactions.sqlite"))
+    store.write_chunks(iter([]), "v1", ["food"])
+
+    assert store.version == "v1"
+    assert store.categories == ["food"]
+    assert store.filter_transactions(datetime(2023, 1, 1)).empty
+    assert store.get_monthly_rollup().df.empty
+    assert store.get_range_totals_df("category", categories=["food"]).empty
+    assert store.get_file_path_aggregated_df().empty
+
+
+def _write_cp1250(file_path, lines: list[str]) -> None:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write("\r\n".join(lines).encode("cp1250"))
+
+
+def test_store_of_chunks_with_different_columns(tmp_path):
+    # ING exports have no description, mbank ones do, ING files come first
+    ing_row = ";".join(["{}"] * 2 + ["Sklep", "Zakupy"] + [""] * 3)
+    ing_row += ";'{}';{};" + ";".join(["PLN"] * 5) + ";Konto;"
+    _write_cp1250(
+        tmp_path / "transactions" / "ing" / "ing.csv",
+        [
+            '"Data transakcji";"Data ksiegowania";"Dane kontrahenta";"Tytul"',
+            ing_row.format("2023-12-02", "2023-12-02", "1", "-12,34"),
+            ing_row.format("2024-01-03", "2024-01-03", "2", "1 000,00"),
+            '"Dokument ma charakter informacyjny";',
+        ],
+    )
+    mbank_row = "{};{};Platnosc karta;Zakup;ZABKA;'123';{};"
+    _write_cp1250(
+        tmp_path / "transactions" / "mbank" / "mbank.csv",
+        [
+            "#Data ksiegowania;#Data operacji;#Opis operacji;#Tytul;#Nadawca;",
+            mbank_row.format("2024-01-05", "2024-01-05", "-5,00 PLN"),
+            ";;;;;;#Saldo koncowe;100,00 PLN;",
+        ],
+    )
+    csv_files = discover_csv_files(str(tmp_path / "transactions"))
+    (tmp_path / "parsed").mkdir()
+    manifest = IngestionManifest(
+        file_path=str(tmp_path / "manifest.csv"), cache_dir=str(tmp_path / "parsed")
+    )
+    categories_rules = read_categories_rules(
+        os.path.join(DEMO_DIR, "categories", "categories_conditions.csv"),
+        add_fallback=True,
+    )
+    categories_cache = CategoriesCache(file_path=str(tmp_path / "categories.sqlite"))
+
+    store = SqlTransactionsStore(file_path=str(tmp_path / "transactions.sqlite"))
+    store.write_chunks(
+        add_columns_in_chunks(
+            iter_csv_files_chunks(csv_files, manifest, chunk_size=1),
+            categories_rules,
+            categories_cache,
+        ),
+        "v1",
+        [],
+    )
+
+    df = store.filter_transactions()
+    assert list(df["account_name"]) == ["Konto", "Konto", "mbank"]
+    assert list(df["description"].fillna("")) == ["", "", "Platnosc karta"]
+    assert list(df["amount"]) == [-12.34, 1000.0, -5.0]
+    assert store.get_monthly_rollup().df["n_transactions"].sum() == 3
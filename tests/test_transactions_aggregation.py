@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project.transactions_aggregation import (
+    FREQUENCIES,
+    get_time_aggregated_income_expense_delta_dfs,
+)
+
+
+@pytest.fixture
+def transactions_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    amount = rng.normal(0, 100, 1000)
+    return pd.DataFrame(
+        {
+            "transaction_date": pd.to_datetime("2023-01-01")
+            + pd.to_timedelta(rng.integers(0, 360 * 24 * 60, 1000), unit="min"),
+            "group_value": rng.choice(["food", "bills", "other"], 1000),
+            "amount_abs": np.abs(amount),
+            "type": np.where(amount > 0, "income", "outcome"),
+        }
+    )
+
+
+def _get_expected_type_df(transactions_df, transaction_type, frequency):
+    type_df = transactions_df[transactions_df["type"] == transaction_type]
+    expected_df = type_df.pivot_table(
+        index=pd.Grouper(
+            key="transaction_date", freq=frequency.tag, label=frequency.label
+        ),
+        columns="group_value",
+        values="amount_abs",
+        aggfunc="sum",
+        fill_value=0.0,
+    )
+    expected_df.index = expected_df.index.strftime(frequency.value_format)
+    return expected_df
+
+
+@pytest.mark.parametrize("frequency", FREQUENCIES[:2], ids=lambda f: f.tag)
+def test_income_expense_delta_in_one_pass(transactions_df, frequency):
+    income_df, expense_df, delta_df = get_time_aggregated_income_expense_delta_dfs(
+        transactions_df, frequency
+    )
+
+    expected_income_df = _get_expected_type_df(transactions_df, "income", frequency)
+    expected_expense_df = _get_expected_type_df(transactions_df, "outcome", frequency)
+    pd.testing.assert_frame_equal(
+        income_df,
+        expected_income_df.reindex(income_df.index, fill_value=0.0),
+        check_names=False,
+    )
+    pd.testing.assert_frame_equal(
+        expense_df,
+        expected_expense_df.reindex(expense_df.index, fill_value=0.0),
+        check_names=False,
+    )
+    assert list(delta_df.columns) == ["income", "outcome", "delta"]
+    np.testing.assert_allclose(delta_df["income"], income_df.sum(axis=1))
+    np.testing.assert_allclose(delta_df["outcome"], expense_df.sum(axis=1))
+    np.testing.assert_allclose(
+        delta_df["delta"], delta_df["income"] - delta_df["outcome"]
+    )
@@ -0,0 +1,311 @@
+import os
+
+import pandas as pd
+import pytest
+
+from project.categories import (
+    CategoriesCache,
+    add_category_rule,
+    read_categories_rules,
+)
+from project.categorization import CategorizationEngine
+from project.constants import UNRECOGNIZED
+from project.utils import hash_string
+from project.transactions_read import (
+    IngParser,
+    MbankParser,
+    MIN_FILES_FOR_PARALLEL_PARSING,
+    add_columns,
+    add_columns_in_chunks,
+    compact_transactions_df,
+    discover_csv_files,
+    format_dates,
+    parse_csv_files,
+    parse_amounts,
+    parse_csv_files_as_df,
+)
+
+DEMO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data_demo")
+DEMO_TRANSACTIONS_DIR = os.path.join(DEMO_DIR, "transactions")
+
+
+def test_parse_csv_files_parallel_keeps_order(tmp_path):
+    demo_file_path = os.path.join(
+        DEMO_TRANSACTIONS_DIR, "generic", "fake_transactions.csv"
+    )
+    generic_dir = tmp_path / "generic"
+    generic_dir.mkdir()
+    for i in range(MIN_FILES_FOR_PARALLEL_PARSING):
+        # files of different length, so a reordering would be visible
+        with open(demo_file_path) as f:
+            lines = f.readlines()[: 10 * (i + 1)]
+        with open(generic_dir / f"transactions_{i}.csv", "w") as f:
+            f.writelines(lines)
+    csv_files = discover_csv_files(str(tmp_path))
+
+    serial_dfs = parse_csv_files(csv_files, max_workers=1)
+    parallel_dfs = parse_csv_files(csv_files, max_workers=2)
+
+    assert len(parallel_dfs) == len(csv_files)
+    for serial_df, parallel_df in zip(serial_dfs, parallel_dfs):
+        pd.testing.assert_frame_equal(serial_df, parallel_df)
+
+
+@pytest.fixture
+def categories_rules_csv_path(tmp_path) -> str:
+    categories_rules_csv_path = str(tmp_path / "categories_conditions.csv")
+    rules_df = pd.read_csv(
+        os.path.join(DEMO_DIR, "categories", "categories_conditions.csv")
+    )
+    # leave some transactions unrecognized
+    rules_df[rules_df["rule_id"] < 40].to_csv(categories_rules_csv_path, index=False)
+    return categories_rules_csv_path
+
+
+def _add_columns(transactions_raw_df, categories_rules_csv_path, cache_file_path):
+    categories_cache = CategoriesCache(file_path=cache_file_path)
+    categories_cache.read()
+    return add_columns(
+        transactions_raw_df,
+        read_categories_rules(categories_rules_csv_path),
+        categories_cache,
+    )
+
+
+@pytest.mark.parametrize("rule_edit", ["append", "modify"])
+def test_add_columns_recategorizes_only_affected_rows(
+    rule_edit, categories_rules_csv_path, tmp_path, monkeypatch
+):
+    transactions_raw_df = parse_csv_files_as_df(
+        discover_csv_files(DEMO_TRANSACTIONS_DIR)
+    )
+    cache_file_path = str(tmp_path / "categories_cache.sqlite")
+    df = _add_columns(transactions_raw_df, categories_rules_csv_path, cache_file_path)
+
+    if rule_edit == "append":
+        add_category_rule(
+            categories_rules_csv_path,
+            column="title",
+            relation="contains",
+            value="a",
+            category="misc",
+        )
+        expected_n_categorized = sum(df["category"] == UNRECOGNIZED)
+    else:
+        rules_df = pd.read_csv(categories_rules_csv_path)
+        rules_df.loc[rules_df["rule_id"] == 20, "category"] = "misc"
+        rules_df.to_csv(categories_rules_csv_path, index=False)
+        expected_n_categorized = sum(
+            (df["category"] == UNRECOGNIZED) | (df["category_rule_id"] >= 20)
+        )
+
+    assert 0 < expected_n_categorized < len(df)
+    categorized_lengths = []
+    categorize = CategorizationEngine.categorize
+
+    def spy_categorize(self, df):
+        categorized_lengths.append(len(df))
+        return categorize(self, df)
+
+    monkeypatch.setattr(CategorizationEngine, "categorize", spy_categorize)
+    df = _add_columns(transactions_raw_df, categories_rules_csv_path, cache_file_path)
+    assert categorized_lengths == [expected_n_categorized]
+
+    expected_df = _add_columns(
+        transactions_raw_df,
+        categories_rules_csv_path,
+        str(tmp_path / "empty_categories_cache.sqlite"),
+    )
+    pd.testing.assert_frame_equal(df, expected_df)
+
+
+def test_add_columns_with_unchanged_rules_categorizes_nothing(
+    categories_rules_csv_path, tmp_path, monkeypatch
+):
+    transactions_raw_df = parse_csv_files_as_df(
+        discover_csv_files(DEMO_TRANSACTIONS_DIR)
+    )
+    cache_file_path = str(tmp_path / "categories_cache.sqlite")
+    df = _add_columns(transactions_raw_df, categories_rules_csv_path, cache_file_path)
+    assert (df["category"] == UNRECOGNIZED).any()
+
+    categorized_lengths = []
+    categorize = CategorizationEngine.categorize
+
+    def spy_categorize(self, df):
+        categorized_lengths.append(len(df))
+        return categorize(self, df)
+
+    monkeypatch.setattr(CategorizationEngine, "categorize", spy_categorize)
+    cached_df = _add_columns(
+        transactions_raw_df, categories_rules_csv_path, cache_file_path
+    )
+
+    # unrecognized rows are not categorized again
+    assert categorized_lengths == []
+    pd.testing.assert_frame_equal(cached_df, df)
+
+
+def test_add_columns_returns_compact_dtypes(categories_rules_csv_path, tmp_path):
+    transactions_raw_df = parse_csv_files_as_df(
+        discover_csv_files(DEMO_TRANSACTIONS_DIR)
+    )
+
+    df = _add_columns(
+        transactions_raw_df,
+        categories_rules_csv_path,
+        str(tmp_path / "categories_cache.sqlite"),
+    )
+
+    assert df["category"].dtype == "category"
+    assert df["transaction_date_isostr_month"].dtype == "category"
+    assert df["category_rule_id"].dtype == "Int64"
+    assert df["category_rule_id"].isna().sum() == sum(df["category"] == UNRECOGNIZED)
+    assert df["title"].dtype == object
+
+
+def test_add_columns_in_chunks_same_as_add_columns(categories_rules_csv_path, tmp_path):
+    transactions_raw_df = parse_csv_files_as_df(
+        discover_csv_files(DEMO_TRANSACTIONS_DIR)
+    )
+    cache_file_path = str(tmp_path / "categories_cache.sqlite")
+    _add_columns(transactions_raw_df, categories_rules_csv_path, cache_file_path)
+    # cached categories of rows in every chunk get outdated
+    rules_df = pd.read_csv(categories_rules_csv_path)
+    rules_df.loc[rules_df["rule_id"] == 20, "category"] = "misc"
+    rules_df.to_csv(categories_rules_csv_path, index=False)
+    categories_rules = read_categories_rules(categories_rules_csv_path)
+
+    categories_cache = CategoriesCache(file_path=cache_file_path)
+    categories_cache.read()
+    # interrupted after the first chunk, the rest is still outdated
+    next(
+        add_columns_in_chunks(
+            [transactions_raw_df.iloc[:300]], categories_rules, categories_cache
+        )
+    )
+    categories_cache.read()
+    assert categories_cache.first_changed_rule_id(categories_rules) == 20
+
+    dfs = add_columns_in_chunks(
+        (
+            transactions_raw_df.iloc[i : i + 300]
+            for i in range(0, len(transactions_raw_df), 300)
+        ),
+        categories_rules,
+        categories_cache,
+    )
+    # categories of chunks differ, so they are concatenated as objects
+    df = compact_transactions_df(pd.concat(list(dfs), ignore_index=True))
+    df = df.sort_values("transaction_date", kind="stable", ignore_index=True)
+
+    expected_df = _add_columns(
+        transactions_raw_df,
+        categories_rules_csv_path,
+        str(tmp_path / "empty_categories_cache.sqlite"),
+    )
+    pd.testing.assert_frame_equal(df, expected_df, check_categorical=False)
+    categories_cache.read()
+    assert categories_cache.first_changed_rule_id(categories_rules) == float("inf")
+
+
+@pytest.mark.parametrize(
+    ['amounts', 'expected_amounts'],
+    [
+        (["-1 234,56 PLN", "12,00", "12,00", "5"], [-1234.56, 12.0, 12.0, 5.0]),
+        ([1.5, -2.25], [1.5, -2.25]),
+    ],
+)
+def test_parse_amounts(amounts, expected_amounts):
+    amounts = pd.Series(amounts, index=range(10, 10 + len(amounts)))
+
+    parsed_amounts = parse_amounts(amounts)
+
+    assert list(parsed_amounts.index) == list(amounts.index)
+    assert list(parsed_amounts) == expected_amounts
+
+
+def test_format_dates():
+    dates = pd.Series(
+        pd.to_datetime(["2024-01-05 00:01", "2024-01-05 10:00", "2023-12-31 00:00"]),
+        index=[2, 1, 0],
+    )
+
+    pd.testing.assert_series_equal(
+        format_dates(dates, "%Y-%m"), dates.dt.strftime("%Y-%m").astype(object)
+    )
+
+
+def _write_cp1250(file_path, lines: list[str]) -> str:
+    with open(file_path, "wb") as f:
+        f.write("\r\n".join(lines).encode("cp1250"))
+    return str(file_path)
+
+
+def test_ing_parser(tmp_path):
+    row = ";".join(["{}"] * 2 + ["Sklep Żabka", "Zakupy spożywcze"] + [""] * 3)
+    row += ";'{}';{};" + ";".join(["PLN"] * 5) + ";Konto Główne;"
+    file_path = _write_cp1250(
+        tmp_path / "ing.csv",
+        [
+            '"Lista transakcji"',
+            '"Dokument wygenerowany: 2024-02-01"',
+            '"Data transakcji";"Data księgowania";"Dane kontrahenta";"Tytuł"',
+            row.format("2024-01-02", "2024-01-02", "1", "-12,34"),
+            row.format("2024-01-03", "2024-01-03", "2", "1 000,00"),
+            '"Dokument ma charakter informacyjny";',
+            '"Saldo końcowe";"5";',
+        ],
+    )
+
+    df = IngParser().parse_and_validate(file_path)
+
+    assert list(df["contractor"]) == ["Sklep Zabka"] * 2
+    assert list(df["title"]) == ["Zakupy spozywcze"] * 2
+    assert list(df["amount"]) == ["-12,34", "1 000,00"]
+    assert list(df["account_name"]) == ["Konto Gowne"] * 2
+    assert list(df["transaction_date"].dt.day) == [2, 3]
+
+
+def test_mbank_parser(tmp_path):
+    row = "{};{};Płatność kartą;Zakup w sklepie;ŻABKA WARSZAWA;'123';{};"
+    file_path = _write_cp1250(
+        tmp_path / "mbank.csv",
+        [
+            "mBank S.A.;",
+            "#Za okres:;",
+            "#Data księgowania;#Data operacji;#Opis operacji;#Tytuł;#Nadawca/Odbiorca;",
+            row.format("2024-01-02", "2024-01-02", "-12,34 PLN"),
+            row.format("2024-01-03", "2024-01-03", "-1,00 PLN"),
+            ";;;;;;#Saldo końcowe;100,00 PLN;",
+        ],
+    )
+
+    df = MbankParser().parse_and_validate(file_path)
+
+    assert list(df["description"]) == ["Patnosc karta"] * 2
+    assert list(df["contractor"]) == ["ZABKA WARSZAWA"] * 2
+    assert list(df["amount"]) == ["-12,34 PLN", "-1,00 PLN"]
+    assert list(df["transaction_id"]) == [
+        hash_string("2024-01-02Patnosc kartaZakup w sklepieZABKA WARSZAWA-12,34 PLN"),
+        hash_string("2024-01-03Patnosc kartaZakup w sklepieZABKA WARSZAWA-1,00 PLN"),
+    ]
+
+
+def test_add_columns_prunes_categories_cache(categories_rules_csv_path, tmp_path):
+    transactions_raw_df = parse_csv_files_as_df(
+        discover_csv_files(DEMO_TRANSACTIONS_DIR)
+    )
+    cache_file_path = str(tmp_path / "categories_cache.sqlite")
+    _add_columns(transactions_raw_df, categories_rules_csv_path, cache_file_path)
+
+    # an input file removed
+    df = _add_columns(
+        transactions_raw_df.iloc[:500], categories_rules_csv_path, cache_file_path
+    )
+
+    categories_df = CategoriesCache(file_path=cache_file_path).get_categories(
+        transactions_raw_df["transaction_id"]
+    )
+    assert categories_df["category"].notna().sum() == len(df)
+    assert categories_df["category"].iloc[:500].notna().all()
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from project.transactions_state import prepare_state_transactions_df
+
+
+def test_prepare_state_transactions_df_keeps_input_unchanged():
+    transactions_df = pd.DataFrame(
+        {
+            "transaction_date": pd.to_datetime(["2024-01-02", "2024-01-01"]),
+            "category": ["food", "bills"],
+            "type": ["outcome", "outcome"],
+            "amount_abs": [10.0, 20.0],
+        }
+    )
+    input_df = transactions_df.copy()
+
+    df = prepare_state_transactions_df(
+        transactions_df,
+        group_by_col="category",
+        n_biggest_groups=1,
+        order_by_command="transaction_date:ascending",
+    )
+
+    pd.testing.assert_frame_equal(transactions_df, input_df)
+    assert list(df["group_value"]) == ["bills", "other"]
+    assert {"display_category", "display_type"} <= set(df.columns)
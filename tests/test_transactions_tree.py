@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from project.transactions_tree import (
+    TreeExpansion,
+    get_lazy_sac_tree_items,
+    get_sac_tree_items,
+)
+
+
+@pytest.fixture
+def transactions_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "category": ["food", "bills", "food", "food", None],
+            "transaction_date_isostr_month": [
+                "2024-01",
+                "2024-01",
+                "2024-02",
+                "2024-01",
+                "2024-01",
+            ],
+            "transaction_date_isostr": [
+                "2024-01-05",
+                "2024-01-07",
+                "2024-02-01",
+                "2024-01-02",
+                "2024-01-09",
+            ],
+            "title": ["t1", "t2", "t3", "t4", "t5"],
+            "contractor": ["c1", "c2", "c3", "c4", "c5"],
+            "amount": [-10.0, -20.0, -5.0, 7.0, -1.0],
+            "amount_abs": [10.0, 20.0, 5.0, 7.0, 1.0],
+            "type": ["outcome", "outcome", "outcome", "income", "outcome"],
+        }
+    )
+
+
+def test_tree_items_totals_per_level(transactions_df):
+    items = get_sac_tree_items(
+        transactions_df, ["category", "transaction_date_isostr_month"]
+    )
+
+    assert [item.label for item in items] == ["bills", "food"]
+    food = items[1]
+    assert [tag.label for tag in food.tag] == [3, "total: -8.00 zł"]
+    assert [item.label for item in food.children] == ["2024-01", "2024-02"]
+    assert [tag.label for tag in food.children[0].tag] == [2, "total: -3.00 zł"]
+    assert [leaf.label for leaf in food.children[0].children] == [
+        "2024-01-05 | t1 | c1",
+        "2024-01-02 | t4 | c4",
+    ]
+
+
+def test_lazy_tree_items_expand_on_selection(transactions_df):
+    nesting_cols = ["category", "transaction_date_isostr_month"]
+    expansion = TreeExpansion()
+    expansion.reset(nesting_cols)
+
+    items, nodes = get_lazy_sac_tree_items(
+        transactions_df, nesting_cols, expansion, max_leaves=1
+    )
+    assert [item.children for item in items] == [[], []]
+    assert expansion.select(nodes[1], max_leaves=1)  # food
+
+    items, nodes = get_lazy_sac_tree_items(
+        transactions_df, nesting_cols, expansion, max_leaves=1
+    )
+    assert [item.label for item in items[1].children] == ["2024-01", "2024-02"]
+    assert expansion.select(nodes[2], max_leaves=1)  # food / 2024-01
+
+    items, nodes = get_lazy_sac_tree_items(
+        transactions_df, nesting_cols, expansion, max_leaves=1
+    )
+    january = items[1].children[0]
+    assert [leaf.label for leaf in january.children] == [
+        "2024-01-05 | t1 | c1",
+        "1 more…",
+    ]
+    assert [node.kind for node in nodes] == [
+        "group",
+        "group",
+        "group",
+        "transaction",
+        "more",
+        "group",
+    ]
+    assert expansion.select(nodes[4], max_leaves=1)
+
+    items, _ = get_lazy_sac_tree_items(
+        transactions_df, nesting_cols, expansion, max_leaves=1
+    )
+    assert len(items[1].children[0].children) == 2
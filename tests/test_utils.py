@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from project.utils import hash_rows, hash_string
+
+
+def test_hash_rows_matches_hash_string_of_joined_values():
+    df = pd.DataFrame(
+        {
+            "transaction_date": ["2024-01-01", "2024-01-02"],
+            "description": [np.nan, 1.5],
+            "title": ["Przelew", "Zakup"],
+            "amount": ["-12,34 PLN", "1 000,00 PLN"],
+        },
+        index=[3, 7],
+    )
+
+    expected = df.apply(lambda r: hash_string("".join([str(v) for v in r])), axis=1)
+
+    pd.testing.assert_series_equal(hash_rows(df), expected, check_dtype=False)
+
+
+def test_hash_rows_compact():
+    df = pd.DataFrame({"title": ["a", "b", "a"], "amount": ["1", "1", "1"]})
+
+    transaction_ids = hash_rows(df, compact=True)
+
+    assert transaction_ids.dtype == "int64"
+    assert transaction_ids[0] == transaction_ids[2] != transaction_ids[1]